@@ -1,14 +1,14 @@
+import argparse
 import os
+import re
 import sys
 import signal
-import subprocess
+import sqlite3
+import threading
 import boto3
-import pwinput
-from PyQt5.QtWidgets import QApplication
-from botocore.exceptions import NoCredentialsError, ClientError
-from yaspin import yaspin
+from botocore.exceptions import NoCredentialsError, ClientError, ProfileNotFound
 from modules.compute_modules.ec2_checker import (
-    check_idle_ec2_instances,
+    fetch_idle_ec2_raw,
     check_available_volumes,
     check_old_amis,
     check_unassociated_elastic_ips,
@@ -18,10 +18,41 @@ from modules.compute_modules.ec2_checker import (
     check_instance_store_backed_amis,
     report_running_instance_costs,
 )
-from modules.compute_modules.lambda_checker import audit_lambda_functions
-from modules.storage_modules.s3_checker import analyze_s3_buckets
+from modules.compute_modules.ec2_inventory import EC2Inventory
+from modules.core_modules.client_factory import (
+    DEFAULT_MAX_POOL_CONNECTIONS,
+    DEFAULT_RETRY_MODE,
+    configure_clients,
+    get_client,
+    get_registry,
+    validate_retry_mode,
+)
+from modules.core_modules.pricing_cache import DEFAULT_CACHE_PATH, DEFAULT_TTL_SECONDS, configure_pricing_cache
+from modules.core_modules.pricing_engine import configure_price_index
+from modules.core_modules.scan_store import ScanStore, attach_scan_store
+from modules.core_modules.replay import ScanRecorder, ScanReplayer, open_interceptor
+from modules.core_modules.rate_limiter import RateLimiter, format_wait_report, parse_rate_overrides
+from modules.compute_modules.lambda_checker import fetch_lambda_raw
+from modules.storage_modules.s3_checker import DEFAULT_BUCKET_WORKERS, collect_s3_buckets
 from modules.storage_modules.rds_checker import audit_rds_instances
-from features.excel_writer import save_report
+from features.scan_diff import (
+    DIFF_SHEET,
+    diff_report_rows,
+    diff_scans,
+    load_results,
+    save_results,
+    summarize_diff,
+    write_diff_json,
+)
+from features.rules import evaluate_check, evaluate_results, load_thresholds
+from features.scan_engine import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_MAX_WORKERS_PER_REGION,
+    ScanTask,
+    run_scan_tasks,
+)
+
+DEFAULT_REPORT_NAME = "cloud_audit_report.xlsx"
 
 def handle_sigint(signum, frame):
     print("\nInterrupted by user. Exiting.")
@@ -42,11 +73,13 @@ def print_welcome_banner(username=None):
         print(f"Hello, {username}!\n")
 
 def get_aws_credentials():
+    import pwinput
+
     print("Enter your AWS credentials (Read-only IAM user):")
     try:
         access_key = input("Access Key ID: ").strip()
         secret_key = pwinput.pwinput(prompt="Secret Access Key: ", mask="*").strip()
-        region = input("Region [default: us-east-1]: ").strip() or "us-east-1"
+        region = input("Region(s) [default: us-east-1, comma-separated or 'all']: ").strip() or "us-east-1"
         ami_days = 30  # Default value
     except KeyboardInterrupt:
         print("\nInterrupted by user. Exiting.")
@@ -60,138 +93,425 @@ def extract_username_from_arn(arn: str) -> str:
     except Exception:
         return arn
 
-def connect_to_aws(access_key, secret_key, region):
-    try:
-        session = boto3.Session(
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=region
-        )
+def get_enabled_regions(ec2_client):
+    regions = ec2_client.describe_regions(AllRegions=True)['Regions']
+    available = [r['RegionName'] for r in regions]
+    enabled = [r['RegionName'] for r in regions if r.get('OptInStatus') in ('opt-in-not-required', 'opted-in')]
+    return sorted(available), sorted(enabled)
 
-        ec2 = session.client("ec2", region_name=region)
-        available_regions = [r['RegionName'] for r in ec2.describe_regions(AllRegions=True)['Regions']]
-        if region not in available_regions:
-            print(f"\n❌ '{region}' is not a valid AWS region.")
-            print("✔️ Available regions include:")
-            print(", ".join(sorted(available_regions)))
-            return None, None
+def parse_region_input(region_input):
+    return [r.strip() for r in region_input.split(',') if r.strip()]
 
-        sts_client = session.client('sts')
+def connect_to_aws(access_key, secret_key, region, client_settings=None, profile=None):
+    """Connect and resolve the region input ("us-east-1", "us-east-1,eu-west-1" or "all").
+
+    Without an access key the standard boto3 credential chain is used
+    (the named profile, environment variables, instance role, ...).
+    """
+    scan_all = region.strip().lower() == "all"
+    requested = [] if scan_all else parse_region_input(region)
+    home_region = requested[0] if requested else "us-east-1"
+    try:
+        if access_key:
+            session = boto3.Session(
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=home_region
+            )
+        else:
+            session = boto3.Session(profile_name=profile, region_name=home_region)
+        configure_clients(session, **(client_settings or {}))
+
+        ec2 = get_client(session, "ec2", home_region)
+        available_regions, enabled_regions = get_enabled_regions(ec2)
+        if scan_all:
+            regions = enabled_regions
+        else:
+            invalid = [r for r in requested if r not in available_regions]
+            if invalid:
+                print(f"\n❌ '{', '.join(invalid)}' is not a valid AWS region.")
+                print("✔️ Available regions include:")
+                print(", ".join(available_regions))
+                return None, None, None
+            regions = requested
+
+        sts_client = get_client(session, 'sts')
         identity = sts_client.get_caller_identity()
         username = extract_username_from_arn(identity.get('Arn', 'Unknown'))
         print("\nConnected to AWS successfully!")
-        return session, username
+        return session, username, regions
 
     except NoCredentialsError:
         print("❌ Invalid credentials.")
-        return None, None
+        return None, None, None
     except ClientError as e:
         print(f"❌ AWS error: {e}")
-        return None, None
-
-def scan_resources_with_spinner(session, region, ami_days):
-    resource_data = {}
-
-    with yaspin(text="Checking idle EC2 instances...", color="cyan") as spinner:
-        resource_data["EC2 - Idle Instances"] = check_idle_ec2_instances(session, region, idle_days=7, cpu_threshold=1.0, network_threshold=100.0)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking unattached EBS volumes...", color="cyan") as spinner:
-        resource_data["EBS - Unattached Volumes"] = check_available_volumes(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking old AMIs...", color="cyan") as spinner:
-        resource_data["AMIs - Old"] = check_old_amis(session, region, ami_days)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking unassociated Elastic IPs...", color="cyan") as spinner:
-        resource_data["Elastic IPs - Unused"] = check_unassociated_elastic_ips(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking orphan snapshots...", color="cyan") as spinner:
-        resource_data["Snapshots - Orphaned"] = check_orphan_snapshots(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking unattached ENIs...", color="cyan") as spinner:
-        resource_data["ENIs - Unattached"] = check_unattached_enis(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking reserved instance utilization...", color="cyan") as spinner:
-        resource_data["Reserved Instances - Underutilized"] = check_reserved_instance_utilization(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Checking instance store-backed AMIs...", color="cyan") as spinner:
-        resource_data["AMIs - Instance Store Backed"] = check_instance_store_backed_amis(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Reporting running instance costs...", color="cyan") as spinner:
-        resource_data["Running Instance Costs"] = report_running_instance_costs(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Auditing Lambda functions...", color="cyan") as spinner:
-        resource_data["Lambda - Functions"] = audit_lambda_functions(session, region)
-        spinner.ok("✅")
-
-    with yaspin(text="Analyzing S3 buckets...", color="cyan") as spinner:
-        s3_client = session.client('s3')
-        cloudtrail_client = session.client('cloudtrail')
-        resource_data["S3 - Bucket Analysis"] = analyze_s3_buckets(s3_client, cloudtrail_client)
-        spinner.ok("✅")
-
-    with yaspin(text="Auditing RDS instances...", color="cyan") as spinner:
-        resource_data["RDS - Instances"] = audit_rds_instances(session, region)
-        spinner.ok("✅")
-
-    return resource_data
+        return None, None, None
+    except ProfileNotFound as e:
+        print(f"❌ {e}")
+        return None, None, None
+
+def scan_s3_buckets(session, **s3_options):
+    return collect_s3_buckets(get_client(session, 's3'), get_client(session, 'cloudtrail'), session=session, **s3_options)
+
+# (sheet key, progress label, check function, extra kwargs, global service?)
+# Checks listed in features.rules.RULES return raw records; their thresholds
+# are applied afterwards, so they can be re-evaluated offline.
+SCAN_CHECKS = [
+    ("EC2 - Idle Instances", "Idle EC2 instances", fetch_idle_ec2_raw, {"idle_days": 7}, False),
+    ("EBS - Unattached Volumes", "Unattached EBS volumes", check_available_volumes, {}, False),
+    ("AMIs - Old", "Old AMIs", check_old_amis, {}, False),
+    ("Elastic IPs - Unused", "Unassociated Elastic IPs", check_unassociated_elastic_ips, {}, False),
+    ("Snapshots - Orphaned", "Orphan snapshots", check_orphan_snapshots, {}, False),
+    ("ENIs - Unattached", "Unattached ENIs", check_unattached_enis, {}, False),
+    ("Reserved Instances - Underutilized", "Reserved instance utilization",
+     check_reserved_instance_utilization, {}, False),
+    ("AMIs - Instance Store Backed", "Instance store-backed AMIs", check_instance_store_backed_amis, {}, False),
+    ("Running Instance Costs", "Running instance costs", report_running_instance_costs, {}, False),
+    ("Lambda - Functions", "Lambda functions", fetch_lambda_raw, {}, False),
+    # S3 is a global service, so it is scanned once regardless of the region count.
+    ("S3 - Bucket Analysis", "S3 buckets", scan_s3_buckets, {}, True),
+    ("RDS - Instances", "RDS instances", audit_rds_instances, {}, False),
+]
+
+# EC2 checks share one inventory per region so each describe call runs once per scan.
+EC2_INVENTORY_CHECKS = {
+    fetch_idle_ec2_raw,
+    check_available_volumes,
+    check_old_amis,
+    check_unassociated_elastic_ips,
+    check_orphan_snapshots,
+    check_unattached_enis,
+    check_reserved_instance_utilization,
+    check_instance_store_backed_amis,
+    report_running_instance_costs,
+}
+
+def check_id(key):
+    """Command-line name of a check: "EC2 - Idle Instances" -> "ec2-idle-instances"."""
+    return re.sub(r'[^a-z0-9]+', '-', key.lower()).strip('-')
+
+def select_checks(selectors=None):
+    """SCAN_CHECKS entries matching any selector, e.g. "s3", "ec2" or "amis-old"; all when empty."""
+    if not selectors:
+        return list(SCAN_CHECKS)
+    selected = []
+    for check in SCAN_CHECKS:
+        name = check_id(check[0])
+        if any(name == sel or name.startswith(sel + '-') for sel in selectors):
+            selected.append(check)
+    return selected
+
+def build_scan_tasks(session, regions, ami_days, s3_options=None, checks=None):
+    multi_region = len(regions) > 1
+    inventories = {region: EC2Inventory(session, region) for region in regions}
+    tasks = []
+    for key, label, func, kwargs, is_global in checks or SCAN_CHECKS:
+        if func is check_old_amis:
+            kwargs = {"ami_days": ami_days}
+        if func is scan_s3_buckets:
+            kwargs = dict(s3_options or {})
+        if is_global:
+            tasks.append(ScanTask(key, label, func, (session,), kwargs))
+            continue
+        for region in regions:
+            task_kwargs = kwargs
+            if func in EC2_INVENTORY_CHECKS:
+                task_kwargs = {**kwargs, "inventory": inventories[region]}
+            task_label = f"{label} ({region})" if multi_region else label
+            tasks.append(ScanTask(key, task_label, func, (session, region), task_kwargs, region))
+    return tasks
+
+def scan_resources_with_spinner(session, regions, ami_days, max_workers=DEFAULT_MAX_WORKERS,
+                                max_workers_per_region=DEFAULT_MAX_WORKERS_PER_REGION, s3_options=None,
+                                checks=None, interactive=True, on_result=None, cancel_event=None):
+    if isinstance(regions, str):
+        regions = [regions]
+    tasks = build_scan_tasks(session, regions, ami_days, s3_options, checks)
+    return run_scan_tasks(
+        tasks,
+        max_workers=max_workers,
+        max_workers_per_region=max_workers_per_region,
+        tag_regions=len(regions) > 1,
+        interactive=interactive,
+        on_result=on_result,
+        cancel_event=cancel_event,
+    )
 
 def choose_output_directory():
-    script = """
-import sys
-from PyQt5.QtWidgets import QApplication, QFileDialog
-app = QApplication(sys.argv)
-folder = QFileDialog.getExistingDirectory(None, "Select Output Directory for Report")
-if folder:
-    print(folder)
-app.quit()
-"""
+    """Ask for the report folder, with a Qt dialog when a display is available."""
+    has_display = sys.platform in ("darwin", "win32") or os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")
     try:
-        result = subprocess.run(["python3", "-c", script], capture_output=True, text=True)
-        return result.stdout.strip()
+        if has_display:
+            try:
+                from PyQt5.QtWidgets import QApplication, QFileDialog
+            except ImportError:
+                pass
+            else:
+                app = QApplication.instance() or QApplication(sys.argv)
+                return QFileDialog.getExistingDirectory(None, "Select Output Directory for Report")
+        return input("Output directory for the report: ").strip()
     except KeyboardInterrupt:
         print("\nInterrupted during folder selection.")
         sys.exit(0)
 
-def main():
-    access_key, secret_key, region, ami_days = get_aws_credentials()
-    session, username = connect_to_aws(access_key, secret_key, region)
+def resolve_output_path(output):
+    """A directory (existing, or given with a trailing slash) gets the default report file name."""
+    if os.path.isdir(output) or output.endswith(os.sep):
+        return os.path.join(output, DEFAULT_REPORT_NAME)
+    return output
+
+def env_flag(name):
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a whole number, got '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Audit an AWS account for idle and unused resources and write an Excel report.",
+        epilog="Every option falls back to its AUDIT_* environment variable, then to the built-in default.",
+    )
+    parser.add_argument("--headless", action="store_true", default=env_flag("AUDIT_HEADLESS"),
+                        help="Run without prompts or dialogs; credentials come from --profile or the "
+                             "standard AWS environment variables and instance role.")
+    parser.add_argument("--profile", default=os.environ.get("AWS_PROFILE"),
+                        help="Named AWS profile to use instead of prompting for keys.")
+    parser.add_argument("--regions", default=os.environ.get("AUDIT_REGIONS"),
+                        help="Comma-separated regions, or 'all' for every enabled region (default: us-east-1).")
+    parser.add_argument("--checks", default=os.environ.get("AUDIT_CHECKS"),
+                        help="Comma-separated checks or check groups to run, e.g. 'ec2,s3' (default: all).")
+    parser.add_argument("--list-checks", action="store_true", help="List the available checks and exit.")
+    parser.add_argument("--output", default=os.environ.get("AUDIT_OUTPUT"),
+                        help=f"Report file or directory (headless default: ./{DEFAULT_REPORT_NAME}).")
+    # String defaults from the environment go through the same type check as the flags.
+    parser.add_argument("--ami-days", type=positive_int, default=os.environ.get("AUDIT_AMI_DAYS", "30"),
+                        help="Age in days after which an AMI is reported as old (default: 30).")
+    parser.add_argument("--max-workers", type=positive_int,
+                        default=os.environ.get("AUDIT_MAX_WORKERS", str(DEFAULT_MAX_WORKERS)))
+    parser.add_argument("--max-workers-per-region", type=positive_int,
+                        default=os.environ.get("AUDIT_MAX_WORKERS_PER_REGION", str(DEFAULT_MAX_WORKERS_PER_REGION)))
+    parser.add_argument("--scan-store", default=os.environ.get("AUDIT_SCAN_STORE"),
+                        help="SQLite file that keeps raw scan data between runs so later scans only fetch "
+                             "what changed (default: off).")
+    parser.add_argument("--results-json", default=os.environ.get("AUDIT_RESULTS_JSON"),
+                        help="Also save the scan results as JSON, for diffing against later scans.")
+    parser.add_argument("--diff-against", default=os.environ.get("AUDIT_DIFF_AGAINST"),
+                        help="Earlier results JSON to compare with, or 'previous' for the last scan in "
+                             "--scan-store. The changes are added to the report as a sheet.")
+    parser.add_argument("--diff-json", default=os.environ.get("AUDIT_DIFF_JSON"),
+                        help="Write the changes found by --diff-against to this JSON file.")
+    parser.add_argument("--thresholds", default=os.environ.get("AUDIT_THRESHOLDS"),
+                        help="JSON file of rule threshold overrides "
+                             "(see python -m features.rules --show-thresholds).")
+    parser.add_argument("--raw-json", default=os.environ.get("AUDIT_RAW_JSON"),
+                        help="Save the raw scan data as JSON, to re-run the rules offline with "
+                             "python -m features.rules.")
+    parser.add_argument("--record", default=os.environ.get("AUDIT_RECORD"),
+                        help="Record every AWS response of this scan to a gzip archive (e.g. scan.jsonl.gz).")
+    parser.add_argument("--replay", default=os.environ.get("AUDIT_REPLAY"),
+                        help="Replay a recorded archive instead of calling AWS; no network or credentials needed.")
+    parser.add_argument("--s3-deep", action="store_true", default=env_flag("AUDIT_S3_DEEP"),
+                        help="List every S3 object instead of reading CloudWatch storage metrics.")
+    parser.add_argument("--s3-bucket-workers", type=positive_int,
+                        default=os.environ.get("AUDIT_S3_BUCKET_WORKERS", str(DEFAULT_BUCKET_WORKERS)),
+                        help=f"How many S3 buckets are audited at once (default: {DEFAULT_BUCKET_WORKERS}).")
+    parser.add_argument("--s3-prefix-workers", type=positive_int,
+                        default=os.environ.get("AUDIT_S3_PREFIX_WORKERS", "1"),
+                        help="With --s3-deep, list this many top-level prefixes of a bucket in parallel (default: 1).")
+    return parser.parse_args(argv)
+
+def load_baseline(diff_against, store):
+    """Results of the scan to diff against, or None when there is nothing to compare with."""
+    if diff_against != "previous":
+        return load_results(diff_against)
+    if store is None:
+        print("❌ --diff-against previous needs --scan-store.")
+        return None
+    previous = store.previous_scan_id()
+    if previous is None:
+        print("No earlier scan in the store to compare with.")
+        return None
+    return store.load_results(previous)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.list_checks:
+        for key, label, *_ in SCAN_CHECKS:
+            print(f"{check_id(key):<40} {label}")
+        return 0
+
+    checks = select_checks([c.strip().lower() for c in (args.checks or "").split(",") if c.strip()])
+    if not checks:
+        print(f"❌ No checks match '{args.checks}'. Use --list-checks to see the available checks.")
+        return 2
+
+    try:
+        thresholds = load_thresholds(args.thresholds)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not load thresholds: {e}")
+        return 2
+
+    interactive = not args.headless
+    if interactive and not args.profile and not args.replay:
+        access_key, secret_key, region, ami_days = get_aws_credentials()
+        region = args.regions or region
+    else:
+        access_key = secret_key = None
+        region = args.regions or "us-east-1"
+    ami_days = args.ami_days
+
+    try:
+        client_settings = {
+            "max_pool_connections": int(os.environ.get("AUDIT_MAX_POOL_CONNECTIONS", DEFAULT_MAX_POOL_CONNECTIONS)),
+            "retry_mode": validate_retry_mode(os.environ.get("AUDIT_RETRY_MODE", DEFAULT_RETRY_MODE)),
+            "rate_limiter": RateLimiter(parse_rate_overrides(os.environ.get("AUDIT_RATE_LIMITS"))),
+            "cancel_event": threading.Event(),
+        }
+    except ValueError as e:
+        print(f"❌ Invalid AWS client settings: {e}")
+        return 2
+    try:
+        client_settings["interceptor"] = open_interceptor(args.record, args.replay)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 2
+    try:
+        return run_audit(args, checks, thresholds, interactive, access_key, secret_key, region, ami_days,
+                         client_settings)
+    finally:
+        interceptor = client_settings["interceptor"]
+        if isinstance(interceptor, ScanRecorder):
+            interceptor.close()
+            print(f"Recorded {interceptor.calls} API responses to {args.record}")
+        elif isinstance(interceptor, ScanReplayer) and interceptor.misses:
+            print(f"⚠️ {interceptor.misses} calls had no recorded response in {args.replay}; "
+                  f"their checks may be incomplete.")
+
+def run_audit(args, checks, thresholds, interactive, access_key, secret_key, region, ami_days, client_settings):
+    session, username, regions = connect_to_aws(access_key, secret_key, region, client_settings, profile=args.profile)
 
     if not session:
         print("Could not connect to AWS. Exiting.")
-        return
-
-    print_welcome_banner(username)
-    resource_data = scan_resources_with_spinner(session, region, ami_days)
+        return 1
+
+    if interactive:
+        print_welcome_banner(username)
+    else:
+        print(f"Connected as {username}")
+    s3_options = {
+        "deep": args.s3_deep,
+        "prefix_workers": args.s3_prefix_workers,
+        "bucket_workers": args.s3_bucket_workers,
+    }
+    try:
+        configure_pricing_cache(
+            os.environ.get("AUDIT_PRICING_CACHE", DEFAULT_CACHE_PATH),
+            float(os.environ.get("AUDIT_PRICING_TTL_HOURS", DEFAULT_TTL_SECONDS / 3600)) * 3600,
+        )
+        if os.environ.get("AUDIT_PRICE_FILE"):
+            configure_price_index(os.environ["AUDIT_PRICE_FILE"])
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"❌ Could not load pricing data: {e}")
+        return 2
+    # The output path is settled up front so sheets can be written while the scan runs.
+    if args.output:
+        file_path = resolve_output_path(args.output)
+    elif not interactive:
+        file_path = DEFAULT_REPORT_NAME
+    else:
+        attempts = 0
+        while attempts < 2:
+            output_dir = choose_output_directory()
+            if output_dir:
+                break
+            else:
+                attempts += 1
+                if attempts < 2:
+                    print("Output directory selection is required to save the report. Please select a folder.")
+                else:
+                    print("User interruption happened. Kindly run again.")
+                    return 1
+        file_path = os.path.join(output_dir, DEFAULT_REPORT_NAME)
+
+    # openpyxl is only needed once there is something to write.
+    from features.report_sink import ReportSink
+
+    # Each check's sheet is written as soon as it finishes; on a crash or
+    # interrupt the sheets finished so far are still saved, or can be
+    # recovered from the sink's journal.
+    sheet_order = [DIFF_SHEET] + [check[0] for check in checks]
+    sink = ReportSink(file_path, sheet_order=sheet_order)
+    try:
+        sink.start()
+    except OSError as e:
+        print(f"❌ Cannot write the report to {file_path}: {e}")
+        return 2
+
+    with sink:
+        store = None
+        if args.scan_store:
+            store = ScanStore(os.path.expanduser(args.scan_store))
+            store.begin_scan(get_client(session, 'sts').get_caller_identity()['Account'])
+            attach_scan_store(session, store)
+
+        print(f"Scanning {len(regions)} region(s): {', '.join(regions)}")
+        raw_data = scan_resources_with_spinner(
+            session, regions, ami_days,
+            max_workers=args.max_workers,
+            max_workers_per_region=args.max_workers_per_region,
+            s3_options=s3_options,
+            checks=checks,
+            interactive=interactive,
+            on_result=lambda key, data: sink.put(key, evaluate_check(key, data, thresholds)),
+            cancel_event=client_settings["cancel_event"],
+        )
+        resource_data = evaluate_results(raw_data, thresholds)
+
+        diff = None
+        if args.diff_against:
+            baseline = load_baseline(args.diff_against, store)
+            if baseline is not None:
+                diff = diff_scans(baseline, resource_data)
+                sink.put(DIFF_SHEET, diff_report_rows(diff))
+
+    if store is not None:
+        store.save_results(resource_data)
+        store.finish_scan()
+    if args.results_json:
+        save_results(args.results_json, resource_data)
+    if args.raw_json:
+        save_results(args.raw_json, raw_data)
 
     print("\nScan complete!\n")
     for resource_name, items in resource_data.items():
         print(f"{resource_name:<35}: {len(items)}")
 
-    attempts = 0
-    while attempts < 2:
-        output_dir = choose_output_directory()
-        if output_dir:
-            break
-        else:
-            attempts += 1
-            if attempts < 2:
-                print("Output directory selection is required to save the report. Please select a folder.")
-            else:
-                print("User interruption happened. Kindly run again.")
-                return
+    wait_report = format_wait_report(get_registry(session).rate_limiter, min_wait=1.0)
+    if wait_report:
+        print("\nTime spent waiting on API rate limits:")
+        for line in wait_report:
+            print(f"  {line}")
+
+    if diff is not None:
+        print("\nChanges since the previous scan:")
+        for line in summarize_diff(diff) or ["No changes."]:
+            print(f"  {line}")
+        if args.diff_json:
+            write_diff_json(args.diff_json, diff)
 
-    file_path = os.path.join(output_dir, "cloud_audit_report.xlsx")
-    save_report(file_path, resource_data)
     print(f"\nReport saved to: {file_path}")
+    if sink.errors:
+        print(f"❌ {len(sink.errors)} sheet(s) could not be written: {', '.join(key for key, _ in sink.errors)}")
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
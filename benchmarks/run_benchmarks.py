@@ -0,0 +1,297 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import boto3
+import botocore.session
+from botocore.awsrequest import AWSResponse
+
+from benchmarks.synthetic_account import PRESETS, build_account
+from features.excel_writer import save_report
+from features.rules import evaluate_check
+from modules.compute_modules import ec2_checker, lambda_checker
+from modules.core_modules.client_factory import configure_clients, get_client
+from modules.core_modules.pricing_cache import PricingCache
+from modules.core_modules.rate_limiter import DEFAULT_RATES, RateLimiter
+from modules.storage_modules import rds_checker, s3_checker
+
+REGION = "us-east-1"
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_TOLERANCE = 0.2
+# Differences below these are noise, whatever the tolerance.
+MIN_SECONDS_DELTA = 0.05
+MIN_PEAK_MB_DELTA = 1.0
+
+# Empty answers for the calls moto does not implement; the synthetic account
+# has no CloudTrail history, reserved instances or price list.
+MOTO_GAPS = {
+    ("cloudtrail", "LookupEvents"): {"Events": []},
+    ("ec2", "DescribeReservedInstances"): {"ReservedInstances": []},
+    ("pricing", "GetProducts"): {"FormatVersion": "aws_v1", "PriceList": []},
+}
+
+WARM_UP_SERVICES = ["ec2", "autoscaling", "cloudwatch", "pricing", "lambda", "s3", "cloudtrail", "rds", "pi"]
+
+
+class MotoGaps:
+    """Client interceptor answering MOTO_GAPS calls after the rate limiter has counted them."""
+
+    def attach(self, client):
+        service = client.meta.service_model.service_name
+
+        def answer(model, **kwargs):
+            response = MOTO_GAPS.get((service, model.name))
+            if response is not None:
+                return AWSResponse(None, 200, {}, None), dict(response, ResponseMetadata={"HTTPStatusCode": 200})
+
+        client.meta.events.register("before-call", answer)
+        return client
+
+
+def scan_s3(session, region):
+    return s3_checker.collect_s3_buckets(get_client(session, "s3"), get_client(session, "cloudtrail"), session=session)
+
+
+def running_instance_costs(session, region):
+    # A fresh pricing cache per run, so every run prices the fleet from scratch.
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PricingCache(os.path.join(directory, "pricing.json"))
+        return ec2_checker.report_running_instance_costs(session, region, pricing_cache=cache)
+
+
+# (benchmark name, check function, report sheet)
+CHECKS = [
+    ("ec2_checker.fetch_idle_ec2_raw", ec2_checker.fetch_idle_ec2_raw, "EC2 - Idle Instances"),
+    ("ec2_checker.check_available_volumes", ec2_checker.check_available_volumes, "EBS - Unattached Volumes"),
+    ("ec2_checker.check_old_amis", ec2_checker.check_old_amis, "AMIs - Old"),
+    ("ec2_checker.check_unassociated_elastic_ips", ec2_checker.check_unassociated_elastic_ips,
+     "Elastic IPs - Unused"),
+    ("ec2_checker.check_orphan_snapshots", ec2_checker.check_orphan_snapshots, "Snapshots - Orphaned"),
+    ("ec2_checker.check_unattached_enis", ec2_checker.check_unattached_enis, "ENIs - Unattached"),
+    ("ec2_checker.check_reserved_instance_utilization", ec2_checker.check_reserved_instance_utilization,
+     "Reserved Instances - Underutilized"),
+    ("ec2_checker.check_instance_store_backed_amis", ec2_checker.check_instance_store_backed_amis,
+     "AMIs - Instance Store Backed"),
+    ("ec2_checker.report_running_instance_costs", running_instance_costs, "Running Instance Costs"),
+    ("lambda_checker.fetch_lambda_raw", lambda_checker.fetch_lambda_raw, "Lambda - Functions"),
+    ("s3_checker.collect_s3_buckets", scan_s3, "S3 - Bucket Analysis"),
+    ("rds_checker.check_rds_utilization", rds_checker.check_rds_utilization, "RDS - Instances"),
+    ("rds_checker.list_rds_snapshots", rds_checker.list_rds_snapshots, "RDS - Snapshots"),
+    ("rds_checker.analyze_performance_insights", rds_checker.analyze_performance_insights,
+     "RDS - Performance Insights"),
+    ("rds_checker.check_rds_proxies", rds_checker.check_rds_proxies, "RDS - Proxies"),
+]
+
+
+def fresh_session(loader):
+    """A new session and client registry, so no inventory, client or cache is shared between runs.
+
+    Only botocore's data loader is shared, so the service models it has
+    already read are not parsed again: that is a one-off cost of the first
+    client of each service, not of the checks.
+    """
+    botocore_session = botocore.session.get_session()
+    botocore_session.register_component("data_loader", loader)
+    session = boto3.Session(botocore_session=botocore_session, region_name=REGION)
+    # A rate of 0 disables a limit: the benchmarks measure the code, not the AWS quotas.
+    limiter = RateLimiter({key: 0 for key in DEFAULT_RATES})
+    configure_clients(session, rate_limiter=limiter, interceptor=MotoGaps())
+    return session, limiter
+
+
+def measure(func):
+    """Run func once; returns (result, seconds, peak traced MB above the starting point)."""
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    return result, seconds, peak / (1024 * 1024)
+
+
+def row_count(result):
+    if isinstance(result, dict):
+        return sum(len(rows) for rows in result.values())
+    return len(result or [])
+
+
+def summarize_runs(runs):
+    """Median wall time of the repeats; calls, rows and peak memory of the first run."""
+    first = runs[0]
+    return {
+        "seconds": round(statistics.median(run["seconds"] for run in runs), 4),
+        "api_calls": first["api_calls"],
+        "peak_mb": round(first["peak_mb"], 2),
+        "rows": first["rows"],
+        "runs": len(runs),
+    }
+
+
+def format_result(name, stats):
+    return f"{name:<52} {stats['seconds']:>9.3f}s {stats['api_calls']:>7} calls {stats['peak_mb']:>9.2f} MB"
+
+
+def run_checks(repeat=1, log=print):
+    """Benchmark every check, then save_report over their evaluated results. Returns {name: stats}."""
+    loader = botocore.session.get_session().get_component("data_loader")
+    warm_up, _ = fresh_session(loader)
+    for service in WARM_UP_SERVICES:
+        get_client(warm_up, service)
+
+    results = {}
+    report_data = {}
+    for name, func, sheet in CHECKS:
+        runs = []
+        for _ in range(repeat):
+            session, limiter = fresh_session(loader)
+            rows, seconds, peak_mb = measure(lambda: func(session, REGION))
+            api_calls = sum(stats["calls"] for stats in limiter.wait_stats().values())
+            runs.append({"seconds": seconds, "api_calls": api_calls, "peak_mb": peak_mb, "rows": row_count(rows)})
+        results[name] = summarize_runs(runs)
+        report_data[sheet] = evaluate_check(sheet, rows)
+        log(format_result(name, results[name]))
+
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.xlsx")
+        for _ in range(repeat):
+            _, seconds, peak_mb = measure(lambda: save_report(path, report_data))
+            runs.append({"seconds": seconds, "api_calls": 0, "peak_mb": peak_mb, "rows": row_count(report_data)})
+    results["excel_writer.save_report"] = summarize_runs(runs)
+    log(format_result("excel_writer.save_report", results["excel_writer.save_report"]))
+    return results
+
+
+def run_benchmarks(sizes, repeat=1, log=print):
+    """Build a synthetic account in moto and benchmark every check against it."""
+    from moto import mock_aws
+
+    # moto needs credentials to sign with, but they must never be real ones.
+    for variable, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                            ("AWS_SESSION_TOKEN", "testing"), ("AWS_DEFAULT_REGION", REGION)):
+        os.environ[variable] = value
+
+    with mock_aws():
+        log("Building synthetic account...")
+        started = time.perf_counter()
+        build_account(boto3.Session(region_name=REGION), REGION, sizes, log)
+        log(f"Built in {time.perf_counter() - started:.1f}s\n")
+
+        tracemalloc.start()
+        try:
+            results = run_checks(repeat, log)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "boto3": boto3.__version__,
+            "sizes": sizes,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_results(old, new, tolerance=DEFAULT_TOLERANCE):
+    """(report lines, regressions) for two benchmark result files.
+
+    More API calls is always a regression; time and peak memory are only
+    when they grow by more than tolerance and the noise floor.
+    """
+    lines = []
+    regressions = []
+    if old["meta"].get("sizes") != new["meta"].get("sizes"):
+        lines.append("⚠️ The two runs used different account sizes; the numbers are not comparable.")
+    lines.append(f"{'Benchmark':<52} {'Time (s)':>20} {'API calls':>15} {'Peak (MB)':>20}")
+    for name, after in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            lines.append(f"{name:<52} (new)")
+            continue
+        problems = []
+        if after["api_calls"] > before["api_calls"]:
+            problems.append("api_calls")
+        if (after["seconds"] > before["seconds"] * (1 + tolerance)
+                and after["seconds"] - before["seconds"] > MIN_SECONDS_DELTA):
+            problems.append("seconds")
+        if (after["peak_mb"] > before["peak_mb"] * (1 + tolerance)
+                and after["peak_mb"] - before["peak_mb"] > MIN_PEAK_MB_DELTA):
+            problems.append("peak_mb")
+        regressions.extend((name, metric) for metric in problems)
+        lines.append(
+            f"{name:<52} {before['seconds']:>9.3f} -> {after['seconds']:<8.3f} "
+            f"{before['api_calls']:>6} -> {after['api_calls']:<6} "
+            f"{before['peak_mb']:>9.2f} -> {after['peak_mb']:<8.2f}"
+            + (f"  ❌ {', '.join(problems)}" if problems else "")
+        )
+    for name in old["results"]:
+        if name not in new["results"]:
+            lines.append(f"{name:<52} (removed)")
+    return lines, regressions
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark every check against a synthetic account in moto and record time, API calls "
+                    "and peak memory."
+    )
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small", help="Account size to build.")
+    for resource in PRESETS["small"]:
+        parser.add_argument(f"--{resource.replace('_', '-')}", type=int, dest=resource,
+                            help=f"Override the preset's {resource.replace('_', ' ')} count.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark; the median time is kept.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Results file (default: {DEFAULT_OUTPUT}).")
+    parser.add_argument("--baseline", help="Compare this run against earlier results and fail on regressions.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="Only compare two saved results files.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed growth in time and memory before it counts as a regression "
+                             f"(default: {DEFAULT_TOLERANCE}).")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        old, new = (load_results(path) for path in args.compare)
+    else:
+        sizes = dict(PRESETS[args.preset])
+        sizes.update({key: getattr(args, key) for key in sizes if getattr(args, key) is not None})
+        if importlib.util.find_spec("moto") is None:
+            print("❌ The benchmarks need moto: pip install -r benchmarks/requirements.txt")
+            return 2
+        new = run_benchmarks(sizes, args.repeat)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(new, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+        if not args.baseline:
+            return 0
+        old = load_results(args.baseline)
+
+    lines, regressions = compare_results(old, new, args.tolerance)
+    print()
+    for line in lines:
+        print(line)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s).")
+        return 1
+    print("\n✅ No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import io
+import json
+import zipfile
+
+# Resource counts per preset. "large" is the size of a busy production account;
+# building it in moto takes a while, mostly for the snapshots.
+PRESETS = {
+    "small": {
+        "instances": 100,
+        "volumes": 50,
+        "snapshots": 500,
+        "amis": 20,
+        "elastic_ips": 10,
+        "enis": 20,
+        "lambdas": 50,
+        "buckets": 20,
+        "objects_per_bucket": 5,
+        "db_instances": 5,
+        "db_snapshots": 10,
+    },
+    "large": {
+        "instances": 10000,
+        "volumes": 2000,
+        "snapshots": 50000,
+        "amis": 500,
+        "elastic_ips": 100,
+        "enis": 500,
+        "lambdas": 5000,
+        "buckets": 1000,
+        "objects_per_bucket": 5,
+        "db_instances": 100,
+        "db_snapshots": 500,
+    },
+}
+
+MAX_INSTANCES_PER_CALL = 1000
+# Snapshots are spread over this many per source volume; every fifth source
+# volume is deleted afterwards so part of the snapshots are orphaned.
+SNAPSHOTS_PER_VOLUME = 50
+LAMBDA_ROLE_POLICY = {
+    "Version": "2012-10-17",
+    "Statement": [{"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}],
+}
+
+
+def lambda_package():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("index.py", "def handler(event, context):\n    return event\n")
+    return buffer.getvalue()
+
+
+def build_ec2(session, region, sizes, log=print):
+    ec2 = session.client("ec2", region_name=region)
+    image_id = ec2.describe_images(Owners=["amazon"])["Images"][0]["ImageId"]
+    zone = f"{region}a"
+
+    instance_ids = []
+    remaining = sizes["instances"]
+    while remaining > 0:
+        count = min(remaining, MAX_INSTANCES_PER_CALL)
+        reservation = ec2.run_instances(ImageId=image_id, MinCount=count, MaxCount=count, InstanceType="t3.micro")
+        instance_ids.extend(inst["InstanceId"] for inst in reservation["Instances"])
+        remaining -= count
+    log(f"  {len(instance_ids)} instances")
+
+    for i in range(sizes["amis"]):
+        ec2.create_image(InstanceId=instance_ids[i % len(instance_ids)], Name=f"bench-ami-{i}")
+    log(f"  {sizes['amis']} AMIs")
+
+    for _ in range(sizes["volumes"]):
+        ec2.create_volume(AvailabilityZone=zone, Size=8)
+    log(f"  {sizes['volumes']} unattached volumes")
+
+    source_count = max(1, -(-sizes["snapshots"] // SNAPSHOTS_PER_VOLUME))
+    sources = [ec2.create_volume(AvailabilityZone=zone, Size=8)["VolumeId"] for _ in range(source_count)]
+    for i in range(sizes["snapshots"]):
+        ec2.create_snapshot(VolumeId=sources[i % source_count], Description=f"bench-snapshot-{i}")
+    for volume_id in sources[::5]:
+        ec2.delete_volume(VolumeId=volume_id)
+    log(f"  {sizes['snapshots']} snapshots")
+
+    for _ in range(sizes["elastic_ips"]):
+        ec2.allocate_address(Domain="vpc")
+    subnet_id = ec2.describe_subnets()["Subnets"][0]["SubnetId"]
+    for _ in range(sizes["enis"]):
+        ec2.create_network_interface(SubnetId=subnet_id)
+    log(f"  {sizes['elastic_ips']} Elastic IPs, {sizes['enis']} ENIs")
+
+
+def build_lambda(session, region, sizes, log=print):
+    iam = session.client("iam", region_name=region)
+    role_arn = iam.create_role(
+        RoleName="bench-lambda-role", AssumeRolePolicyDocument=json.dumps(LAMBDA_ROLE_POLICY)
+    )["Role"]["Arn"]
+    client = session.client("lambda", region_name=region)
+    package = lambda_package()
+    for i in range(sizes["lambdas"]):
+        name = f"bench-function-{i}"
+        client.create_function(
+            FunctionName=name, Runtime="python3.12", Role=role_arn, Handler="index.handler",
+            Code={"ZipFile": package}, MemorySize=128 if i % 2 else 1024, Timeout=3 if i % 3 else 120,
+        )
+        if i % 10 == 0:
+            client.add_permission(
+                FunctionName=name, StatementId="bench", Action="lambda:InvokeFunction",
+                Principal="events.amazonaws.com",
+            )
+    log(f"  {sizes['lambdas']} Lambda functions")
+
+
+def build_s3(session, region, sizes, log=print):
+    s3 = session.client("s3", region_name=region)
+    for i in range(sizes["buckets"]):
+        bucket = f"bench-bucket-{i:05d}"
+        s3.create_bucket(Bucket=bucket)
+        for n in range(sizes["objects_per_bucket"]):
+            s3.put_object(Bucket=bucket, Key=f"data/{n}.txt", Body=b"x" * 1024)
+    log(f"  {sizes['buckets']} buckets")
+
+
+def build_rds(session, region, sizes, log=print):
+    rds = session.client("rds", region_name=region)
+    for i in range(sizes["db_instances"]):
+        rds.create_db_instance(
+            DBInstanceIdentifier=f"bench-db-{i}", DBInstanceClass="db.t3.micro", Engine="mysql",
+            AllocatedStorage=20, MasterUsername="admin", MasterUserPassword="benchmark-password",
+        )
+    for i in range(sizes["db_snapshots"] if sizes["db_instances"] else 0):
+        rds.create_db_snapshot(
+            DBSnapshotIdentifier=f"bench-db-snapshot-{i}",
+            DBInstanceIdentifier=f"bench-db-{i % sizes['db_instances']}",
+        )
+    log(f"  {sizes['db_instances']} DB instances, {sizes['db_snapshots']} DB snapshots")
+
+
+def build_account(session, region, sizes, log=print):
+    """Create a synthetic account of the given size in the active moto backend."""
+    for build in (build_ec2, build_lambda, build_s3, build_rds):
+        build(session, region, sizes, log)
@@ -1,23 +1,14 @@
+from itertools import chain
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 
-def write_resource_sheet(wb, resource_name, data):
-    safe_title = resource_name[:31]  # Excel title limit
-    ws = wb.create_sheet(title=safe_title)
+RESOURCE_ID_COLUMNS = ["resource id", "resource_id", "bucket name", "db instance identifier"]
+FLAG_COLUMNS = ["used?", "idle?", "underutilized?"]
 
-    if not data:
-        ws.append(["No data found."])
-        return
-
-    if not isinstance(data, list) or not isinstance(data[0], dict):
-        ws.append(["Invalid data format."])
-        return
-
-    headers = list(data[0].keys())
-    ws.append(headers)
-
-    # Style configuration
+def build_named_styles():
+    """The report's cell styles, registered once per workbook and shared by every cell."""
     header_font = Font(bold=True, color="FFFFFF", size=12, name="Calibri")
     data_font = Font(size=10, name="Calibri")
     resource_id_font = Font(size=11, name="Calibri", bold=True)
@@ -32,63 +23,117 @@ def write_resource_sheet(wb, resource_name, data):
         top=Side(style='thin'), bottom=Side(style='thin')
     )
 
-    # Format headers
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = alignment
-        cell.border = thin_border
-        ws.column_dimensions[get_column_letter(col_num)].width = max(22, len(header) + 5)
+    def style(name, font, fill=None):
+        named = NamedStyle(name=name, font=font, alignment=alignment, border=thin_border)
+        if fill is not None:
+            named.fill = fill
+        return named
+
+    return [
+        style("audit_header", header_font, header_fill),
+        style("audit_data", data_font),
+        style("audit_data_alt", data_font, alt_fill),
+        style("audit_resource_id", resource_id_font),
+        style("audit_resource_id_alt", resource_id_font, alt_fill),
+        style("audit_highlight", data_font, highlight_fill),
+    ]
+
+def new_report_workbook():
+    """A write-only workbook: rows are streamed to disk as they are appended."""
+    wb = Workbook(write_only=True)
+    for named_style in build_named_styles():
+        wb.add_named_style(named_style)
+    return wb
+
+def format_value(key, value, row_data):
+    # Sanitize problematic types for Excel
+    if isinstance(value, dict):
+        return str(value)
+    if key == "Notes" and isinstance(value, list):
+        notes = list(value)
+        if str(row_data.get("Versioning", "")).lower() == "disabled":
+            notes.append("Consider enabling object versioning.")
+        return ', '.join(str(v) for v in notes)
+    if isinstance(value, list):
+        return ', '.join(str(v) for v in value)
+    return value
 
-    # Write and format data rows
-    for row_idx, row_data in enumerate(data, start=2):
-        for col_idx, key in enumerate(headers, start=1):
-            value = row_data.get(key, "")
-
-            # Sanitize problematic types for Excel
-            if isinstance(value, dict):
-                value = str(value)
-            elif key == "Notes" and isinstance(value, list):
-                if row_data.get("Versioning", "").lower() == "disabled":
-                    value.append("Consider enabling object versioning.")
-                value = ', '.join(str(v) for v in value)
-            elif isinstance(value, list):
-                value = ', '.join(str(v) for v in value)
-
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-
-            # Font styling
-            if key.lower() in ["resource id", "resource_id", "bucket name", "db instance identifier"]:
-                cell.font = resource_id_font
-            else:
-                cell.font = data_font
+def write_resource_sheet(wb, resource_name, data):
+    """Append one sheet of rows to a write-only workbook, writing each row exactly once.
 
-            cell.alignment = alignment
-            cell.border = thin_border
+    data may be any iterable of dicts (a generator works) and is consumed
+    row by row, so memory stays flat however many rows there are. The
+    headers come from the first row.
+    """
+    safe_title = resource_name[:31]  # Excel title limit
+    ws = wb.create_sheet(title=safe_title)
 
-            # Conditional highlight
-            if key.lower() in ["used?", "idle?", "underutilized?"] and str(value).lower() == "no":
-                cell.fill = highlight_fill
+    rows = iter(data or [])
+    first = next(rows, None)
+    if first is None:
+        ws.append(["No data found."])
+        return 0
 
-        # Alternate row coloring
-        if row_idx % 2 == 0:
-            for col in range(1, len(headers) + 1):
-                ws.cell(row=row_idx, column=col).fill = alt_fill
+    if not isinstance(first, dict):
+        ws.append(["Invalid data format."])
+        return 0
+
+    headers = list(first.keys())
+    for col_num, header in enumerate(headers, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = max(22, len(header) + 5)
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.style = "audit_header"
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    # Per-column base style names for (odd, even) data rows; even rows are shaded.
+    column_styles = [
+        ("audit_resource_id", "audit_resource_id_alt") if key.lower() in RESOURCE_ID_COLUMNS
+        else ("audit_data", "audit_data_alt")
+        for key in headers
+    ]
+    flag_columns = [key.lower() in FLAG_COLUMNS for key in headers]
+
+    count = 0
+    for row_idx, row_data in enumerate(chain([first], rows), start=2):
+        shaded = row_idx % 2 == 0
+        cells = []
+        for col_idx, key in enumerate(headers):
+            value = format_value(key, row_data.get(key, ""), row_data)
+            cell = WriteOnlyCell(ws, value=value)
+            # Conditional highlight takes precedence over row shading.
+            if flag_columns[col_idx] and str(value).lower() == "no":
+                cell.style = "audit_highlight"
+            else:
+                cell.style = column_styles[col_idx][shaded]
+            cells.append(cell)
+        ws.append(cells)
+        count += 1
+    return count
+
+def iter_report_sheets(resource_name, data):
+    """(sheet title, rows) pairs for one resource_data entry, skipping empty results."""
+    if resource_name == "RDS - Instances" and isinstance(data, dict):
+        # Handle nested structure from audit_rds_instances()
+        for sub_key, sub_data in data.items():
+            if isinstance(sub_data, list) and sub_data:
+                yield f"RDS - {sub_key}"[:31], sub_data  # Excel limit
+    elif isinstance(data, list) and data:
+        yield resource_name[:31], data  # Excel limit
 
 def save_report(filename, resource_data_map):
-    wb = Workbook()
-    wb.remove(wb.active)  # Remove default blank sheet
+    wb = new_report_workbook()
 
+    sheets = 0
     for resource_name, data in resource_data_map.items():
-        if resource_name == "RDS - Instances" and isinstance(data, dict):
-            # Handle nested structure from audit_rds_instances()
-            for sub_key, sub_data in data.items():
-                if isinstance(sub_data, list) and sub_data:
-                    sheet_title = f"RDS - {sub_key}"[:31]  # Excel limit
-                    write_resource_sheet(wb, sheet_title, sub_data)
-        elif isinstance(data, list) and data:
-            sheet_title = resource_name[:31]  # Excel limit
-            write_resource_sheet(wb, sheet_title, data)
+        for sheet_title, rows in iter_report_sheets(resource_name, data):
+            write_resource_sheet(wb, sheet_title, rows)
+            sheets += 1
+
+    if not sheets:
+        write_resource_sheet(wb, "Summary", [])
 
     wb.save(filename)
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from features.excel_writer import iter_report_sheets, new_report_workbook, write_resource_sheet
+
+_DONE = object()
+JOURNAL_SUFFIX = ".partial.jsonl"
+
+
+def journal_path(filename):
+    return filename + JOURNAL_SUFFIX
+
+
+def check_writable(filename):
+    """Raise OSError now, rather than after a long scan, if the report can't be written."""
+    existed = os.path.exists(filename)
+    with open(filename, "ab"):
+        pass
+    if not existed:
+        os.remove(filename)
+
+
+class ReportSink:
+    """Writes finished checks into the report on a background thread while the scan goes on.
+
+    put() hands over one check's merged result and returns immediately.
+    close() waits for the queued sheets, puts them back in sheet_order
+    (the scan order, not the order checks happened to finish in) and saves
+    the workbook. Used as a context manager it also closes on errors and
+    interrupts, so the sheets finished so far still reach disk.
+
+    A write-only workbook can only be saved once, so every finished check is
+    also appended to a journal next to the report and synced to disk. If the
+    process dies before close() (out of memory, killed), recover_report()
+    rebuilds the report from the journal; after a successful save the
+    journal is removed.
+    """
+
+    def __init__(self, filename, sheet_order=None, journal=True):
+        self.filename = filename
+        self.sheet_order = list(sheet_order or [])
+        self.errors = []
+        self.journal_path = journal_path(filename) if journal else None
+        self._journal = None
+        self._wb = new_report_workbook()
+        self._sheet_keys = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self._started = False
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def start(self):
+        """Check the report path and open the journal. Raises OSError if either can't be written."""
+        if self._started:
+            return
+        check_writable(self.filename)
+        if self.journal_path:
+            if os.path.exists(self.journal_path):
+                kept = self.journal_path + ".old"
+                os.replace(self.journal_path, kept)
+                print(f"⚠️ Found the journal of an unfinished report; kept it as {kept}. "
+                      f"Recover it with: python -m features.report_sink {kept}")
+            self._journal = open(self.journal_path, "w", encoding="utf-8")
+            self._append_journal({"sheet_order": self.sheet_order})
+        self._started = True
+        self._thread.start()
+
+    def put(self, key, data):
+        self._queue.put((key, data))
+
+    def _append_journal(self, entry):
+        self._journal.write(json.dumps(entry, default=str) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            key, data = item
+            try:
+                if self._journal is not None:
+                    self._append_journal({"key": key, "data": data})
+                for sheet_title, rows in iter_report_sheets(key, data):
+                    write_resource_sheet(self._wb, sheet_title, rows)
+                    self._sheet_keys[sheet_title] = key
+            except Exception as e:
+                self.errors.append((key, e))
+                print(f"[Error] Writing sheet {key}: {e}")
+
+    def _order_sheets(self):
+        rank = {key: i for i, key in enumerate(self.sheet_order)}
+        sheets = list(self._wb.worksheets)
+        ordered = sorted(
+            sheets,
+            key=lambda ws: (rank.get(self._sheet_keys.get(ws.title), len(rank)), sheets.index(ws)),
+        )
+        for position, ws in enumerate(ordered):
+            self._wb.move_sheet(ws.title, position - self._wb.index(ws))
+
+    def close(self):
+        """Finish writing and save. Returns the number of sheets written."""
+        if self._closed:
+            return len(self._wb.worksheets)
+        self._closed = True
+        if self._started:
+            self._queue.put(_DONE)
+            self._thread.join()
+
+        if not self._wb.worksheets:
+            write_resource_sheet(self._wb, "Summary", [])
+        self._order_sheets()
+        try:
+            self._wb.save(self.filename)
+        except Exception:
+            if self._journal is not None:
+                print(f"❌ Saving {self.filename} failed; the finished sheets are kept in {self.journal_path}.")
+            raise
+        finally:
+            if self._journal is not None:
+                self._journal.close()
+        if self._journal is not None:
+            os.remove(self.journal_path)
+        return len(self._wb.worksheets)
+
+
+def recover_report(journal, filename=None):
+    """Rebuild a report from the journal an interrupted scan left behind. Returns the report path."""
+    if filename is None:
+        filename = journal.split(JOURNAL_SUFFIX)[0]
+    with open(journal, encoding="utf-8") as f:
+        entries = []
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # The last line may be cut short if the process died mid-write.
+                break
+    if not entries or "sheet_order" not in entries[0]:
+        raise ValueError(f"{journal} is not a report journal.")
+
+    sink = ReportSink(filename, entries[0]["sheet_order"], journal=False)
+    with sink:
+        for entry in entries[1:]:
+            sink.put(entry["key"], entry["data"])
+    return filename
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild a report from the journal an interrupted scan left behind.")
+    parser.add_argument("journal", help=f"The report's journal (<report>{JOURNAL_SUFFIX}).")
+    parser.add_argument("--output", help="Report to write (default: the journal's report path).")
+    args = parser.parse_args(argv)
+
+    try:
+        filename = recover_report(args.journal, args.output)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 2
+    print(f"Report recovered to: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
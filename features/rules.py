@@ -0,0 +1,105 @@
+import argparse
+import json
+import sys
+from modules.compute_modules.ec2_checker import evaluate_idle_ec2
+from modules.compute_modules.lambda_checker import evaluate_lambda_function
+from modules.storage_modules.s3_checker import evaluate_bucket
+
+# Sheets whose scan result is raw data, with the rule that turns one raw
+# record into a report row (or None when nothing is worth reporting).
+RULES = {
+    "EC2 - Idle Instances": evaluate_idle_ec2,
+    "Lambda - Functions": evaluate_lambda_function,
+    "S3 - Bucket Analysis": evaluate_bucket,
+}
+
+DEFAULT_THRESHOLDS = {
+    "EC2 - Idle Instances": {
+        "cpu_threshold": 1.0,
+        "network_threshold": 100.0,
+    },
+    "Lambda - Functions": {
+        "max_layers": 3,
+        "oversized_memory_mb": 512,
+        "low_avg_duration_ms": 200,
+        "high_timeout_s": 60,
+        "low_max_duration_ms": 1000,
+        "stale_days": 180,
+    },
+    "S3 - Bucket Analysis": {
+        "stale_upload_days": 30,
+        "old_data_days": 365,
+    },
+}
+
+
+def load_thresholds(path=None):
+    """DEFAULT_THRESHOLDS with the per-sheet overrides from a JSON file applied."""
+    thresholds = {sheet: dict(values) for sheet, values in DEFAULT_THRESHOLDS.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        for sheet, values in overrides.items():
+            if sheet not in thresholds:
+                raise ValueError(f"No rules for sheet '{sheet}'. Known sheets: {', '.join(thresholds)}")
+            unknown = set(values) - set(thresholds[sheet])
+            if unknown:
+                raise ValueError(f"Unknown thresholds for '{sheet}': {', '.join(sorted(unknown))}")
+            thresholds[sheet].update(values)
+    return thresholds
+
+
+def evaluate_check(key, data, thresholds=None):
+    """Report rows for one sheet. Sheets without rules are already report rows and pass through."""
+    rule = RULES.get(key)
+    if rule is None or not isinstance(data, list):
+        return data
+    params = (thresholds or DEFAULT_THRESHOLDS).get(key, {})
+    rows = []
+    for record in data:
+        row = rule(record, **params)
+        if row is None:
+            continue
+        # Multi-region scans tag raw records with their region; keep it as the leading column.
+        if "Region" in record and "Region" not in row:
+            row = {"Region": record["Region"], **row}
+        rows.append(row)
+    return rows
+
+
+def evaluate_results(raw_data, thresholds=None):
+    return {key: evaluate_check(key, data, thresholds) for key, data in raw_data.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-run the audit rules over saved raw scan data, without contacting AWS."
+    )
+    parser.add_argument("raw", help="Raw scan data saved with --raw-json.")
+    parser.add_argument("--thresholds", help="JSON file of per-sheet threshold overrides.")
+    parser.add_argument("--output", help="Write the re-evaluated report to this workbook.")
+    parser.add_argument("--json", help="Write the re-evaluated results to this JSON file.")
+    parser.add_argument("--show-thresholds", action="store_true", help="Print the default thresholds and exit.")
+    args = parser.parse_args(argv)
+
+    if args.show_thresholds:
+        print(json.dumps(DEFAULT_THRESHOLDS, indent=2))
+        return 0
+
+    with open(args.raw, encoding="utf-8") as f:
+        raw_data = json.load(f)
+    resource_data = evaluate_results(raw_data, load_thresholds(args.thresholds))
+
+    for resource_name, items in resource_data.items():
+        print(f"{resource_name:<35}: {len(items)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resource_data, f, default=str)
+    if args.output:
+        from features.excel_writer import save_report
+        save_report(args.output, resource_data)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
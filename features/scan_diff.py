@@ -0,0 +1,176 @@
+import argparse
+import json
+import re
+import sys
+
+# Columns that identify a row, tried in order; the first one a sheet has is used.
+ID_COLUMNS = ["Resource ID", "Bucket Name", "FunctionName", "DB Identifier", "Snapshot ID", "Proxy Name"]
+
+# Columns that drift on every scan (ages, rolling metric averages) and would
+# otherwise mark almost every row as changed.
+IGNORED_COLUMNS = {
+    "Idle Days",
+    "Age (days)",
+    "LastModifiedDaysAgo",
+    "CPU Avg (%)",
+    "NetworkOut Avg (Bytes)",
+    "AvgDuration",
+    "Invocations",
+    "CPU Utilization (%)",
+    "Used Storage (%)",
+    "Top Query",
+}
+
+# Volatile fragments inside otherwise stable columns, removed before comparing.
+# S3 notes embed the CloudTrail operation count and last access date.
+VOLATILE_FRAGMENTS = {
+    "Notes": re.compile(r" \(\d+ object operations, last on [^)]*\)"),
+}
+
+DIFF_SHEET = "Scan Changes"
+
+
+def normalize_results(resource_data):
+    """Plain JSON values (dates as strings), with nested RDS results split into their own sheets."""
+    data = json.loads(json.dumps(resource_data, default=str))
+    sheets = {}
+    for name, rows in data.items():
+        if isinstance(rows, dict):
+            for sub_key, sub_rows in rows.items():
+                sheets[f"RDS - {sub_key}"] = sub_rows
+        else:
+            sheets[name] = rows
+    return sheets
+
+
+def row_label(row):
+    for column in ID_COLUMNS:
+        if column in row:
+            return str(row[column])
+    return " / ".join(str(value) for value in list(row.values())[:2])
+
+
+def index_rows(rows):
+    """{(region, label, n): row} for one sheet; n numbers rows that share a label."""
+    index = {}
+    seen = {}
+    for row in rows:
+        base = (row.get("Region", ""), row_label(row))
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        index[base + (n,)] = row
+    return index
+
+
+def comparable_value(column, value):
+    pattern = VOLATILE_FRAGMENTS.get(column)
+    if pattern is None:
+        return value
+    if isinstance(value, list):
+        return [pattern.sub("", str(item)) for item in value]
+    return pattern.sub("", str(value))
+
+
+def diff_rows(old_row, new_row, ignore):
+    return {
+        column: [old_row.get(column), new_row.get(column)]
+        for column in dict.fromkeys(list(old_row) + list(new_row))
+        if column not in ignore
+        and comparable_value(column, old_row.get(column)) != comparable_value(column, new_row.get(column))
+    }
+
+
+def diff_scans(old_results, new_results, ignore=IGNORED_COLUMNS):
+    """Compare two scans' resource_data, sheet by sheet, keyed by (region, resource ID).
+
+    Every row is hashed into a dict once, so the diff is linear in the
+    total row count. Returns {sheet: {'added': [row], 'removed': [row],
+    'changed': [{'resource': ..., 'region': ..., 'changes': {column: [old, new]}, 'row': new_row}]}}
+    with only the sheets that changed.
+    """
+    old_sheets = normalize_results(old_results)
+    new_sheets = normalize_results(new_results)
+    diff = {}
+    for sheet in dict.fromkeys(list(new_sheets) + list(old_sheets)):
+        old_index = index_rows(old_sheets.get(sheet) or [])
+        new_index = index_rows(new_sheets.get(sheet) or [])
+
+        added = [row for key, row in new_index.items() if key not in old_index]
+        removed = [row for key, row in old_index.items() if key not in new_index]
+        changed = []
+        for key, new_row in new_index.items():
+            old_row = old_index.get(key)
+            if old_row is None:
+                continue
+            changes = diff_rows(old_row, new_row, ignore)
+            if changes:
+                changed.append({"resource": key[1], "region": key[0], "changes": changes, "row": new_row})
+
+        if added or removed or changed:
+            diff[sheet] = {"added": added, "removed": removed, "changed": changed}
+    return diff
+
+
+def format_change(changes):
+    return "; ".join(f"{column}: {old} -> {new}" for column, (old, new) in changes.items())
+
+
+def diff_report_rows(diff):
+    """Flatten a diff into rows for a report sheet."""
+    rows = []
+    for sheet, sections in diff.items():
+        for row in sections["added"]:
+            rows.append({"Sheet": sheet, "Change": "Added", "Region": row.get("Region", ""),
+                         "Resource": row_label(row), "Details": row.get("Suggestion", "")})
+        for row in sections["removed"]:
+            rows.append({"Sheet": sheet, "Change": "Removed", "Region": row.get("Region", ""),
+                         "Resource": row_label(row), "Details": ""})
+        for change in sections["changed"]:
+            rows.append({"Sheet": sheet, "Change": "Changed", "Region": change["region"],
+                         "Resource": change["resource"], "Details": format_change(change["changes"])})
+    return rows
+
+
+def summarize_diff(diff):
+    return [
+        f"{sheet:<35}: +{len(s['added'])} -{len(s['removed'])} ~{len(s['changed'])}"
+        for sheet, s in diff.items()
+    ]
+
+
+def save_results(path, resource_data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(resource_data, f, default=str)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_diff_json(path, diff):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(diff, f, indent=2, default=str)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what changed between two saved scan results.")
+    parser.add_argument("old", help="Earlier scan results (JSON written with --results-json).")
+    parser.add_argument("new", help="Later scan results.")
+    parser.add_argument("--json", help="Write the full diff to this JSON file.")
+    parser.add_argument("--xlsx", help=f"Write the diff as a '{DIFF_SHEET}' sheet to this workbook.")
+    args = parser.parse_args(argv)
+
+    diff = diff_scans(load_results(args.old), load_results(args.new))
+    for line in summarize_diff(diff) or ["No changes."]:
+        print(line)
+    if args.json:
+        write_diff_json(args.json, diff)
+    if args.xlsx:
+        from features.excel_writer import save_report
+        save_report(args.xlsx, {DIFF_SHEET: diff_report_rows(diff)})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
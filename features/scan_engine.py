@@ -0,0 +1,178 @@
+import threading
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_MAX_WORKERS_PER_REGION = 4
+
+# region is None for global checks (e.g. S3) that run once per scan.
+ScanTask = namedtuple("ScanTask", ["key", "label", "func", "args", "kwargs", "region"], defaults=(None,))
+
+
+def _progress_text(done, total, running):
+    text = f"Scanning resources... {done}/{total} checks complete"
+    if running:
+        labels = sorted(running)
+        shown = ', '.join(labels[:3])
+        if len(labels) > 3:
+            shown += f" +{len(labels) - 3} more"
+        text += f" (running: {shown})"
+    return text
+
+
+class _PlainProgress:
+    """Line-per-check stand-in for the spinner when there is no terminal (cron, CI)."""
+
+    text = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def write(self, line):
+        print(line, flush=True)
+
+    def ok(self, mark):
+        pass
+
+
+def _progress(text, interactive):
+    if not interactive:
+        return _PlainProgress()
+    from yaspin import yaspin
+    return yaspin(text=text, color="cyan")
+
+
+def _tag_rows(rows, region):
+    return [{"Region": region, **row} for row in rows]
+
+
+def merge_task_results(tasks, results, tag_regions=False):
+    """Merge per-task results into one resource_data dict keyed by sheet name.
+
+    results holds one entry per task, in task order. Results of the same
+    check from several regions are concatenated; with tag_regions every row
+    of a regional check gets a leading Region column. Nested results (a dict
+    of row lists, as returned by audit_rds_instances) are merged per sub-key.
+    """
+    resource_data = {}
+    for task, result in zip(tasks, results):
+        if result is None:
+            result = []
+        if tag_regions and task.region:
+            if isinstance(result, dict):
+                result = {sub_key: _tag_rows(rows, task.region) for sub_key, rows in result.items()}
+            else:
+                result = _tag_rows(result, task.region)
+
+        if task.key not in resource_data:
+            resource_data[task.key] = result
+            continue
+
+        merged = resource_data[task.key]
+        if isinstance(merged, dict) and isinstance(result, dict):
+            for sub_key, rows in result.items():
+                merged[sub_key] = merged.get(sub_key, []) + rows
+        elif isinstance(merged, list) and isinstance(result, list):
+            resource_data[task.key] = merged + result
+        elif not merged:
+            resource_data[task.key] = result
+    return resource_data
+
+
+def run_scan_tasks(tasks, max_workers=DEFAULT_MAX_WORKERS, max_workers_per_region=None, tag_regions=False,
+                   interactive=True, on_result=None, cancel_event=None):
+    """Run scan tasks on a bounded worker pool behind one live progress line.
+
+    At most max_workers tasks run at once overall, and at most
+    max_workers_per_region of them against any single region. Returns the
+    merged resource_data dict, keyed in the order the tasks were given.
+    With interactive=False each finished check is printed on its own line
+    instead of updating a spinner.
+
+    on_result(key, result) is called as soon as every task of a check has
+    finished (all of its regions), with that check's merged result, so
+    results can be consumed while the rest of the scan is still running.
+
+    If the scan is interrupted, queued checks are cancelled and cancel_event
+    is set; checks already running are expected to stop at their next API
+    call (see client_factory.ClientRegistry).
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}.")
+    if max_workers_per_region is not None and max_workers_per_region < 1:
+        raise ValueError(f"max_workers_per_region must be at least 1, got {max_workers_per_region}.")
+    results = [None] * len(tasks)
+    running = set()
+    lock = threading.Lock()
+    pending = list(range(len(tasks)))
+    in_flight = {}
+    region_load = Counter()
+    remaining = Counter(task.key for task in tasks)
+
+    def finish_check(key):
+        indices = [i for i, task in enumerate(tasks) if task.key == key]
+        merged = merge_task_results([tasks[i] for i in indices], [results[i] for i in indices], tag_regions)
+        on_result(key, merged[key])
+
+    def run_task(task):
+        with lock:
+            running.add(task.label)
+        return task.func(*task.args, **task.kwargs)
+
+    def has_capacity(task):
+        if max_workers_per_region is None or task.region is None:
+            return True
+        return region_load[task.region] < max_workers_per_region
+
+    def submit_ready(pool):
+        for index in list(pending):
+            if len(in_flight) >= max_workers:
+                break
+            task = tasks[index]
+            if has_capacity(task):
+                pending.remove(index)
+                region_load[task.region] += 1
+                in_flight[pool.submit(run_task, task)] = index
+
+    with _progress(_progress_text(0, len(tasks), running), interactive) as spinner:
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        done_count = 0
+        try:
+            submit_ready(pool)
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = in_flight.pop(future)
+                    task = tasks[index]
+                    region_load[task.region] -= 1
+                    done_count += 1
+                    with lock:
+                        running.discard(task.label)
+                    try:
+                        results[index] = future.result()
+                        spinner.write(f"✅ {task.label}")
+                    except Exception as e:
+                        spinner.write(f"❌ {task.label} [Error] {e}")
+                    remaining[task.key] -= 1
+                    if on_result is not None and not remaining[task.key]:
+                        finish_check(task.key)
+                submit_ready(pool)
+                with lock:
+                    spinner.text = _progress_text(done_count, len(tasks), running)
+        except BaseException:
+            if cancel_event is not None:
+                cancel_event.set()
+            # Don't keep queued checks alive if the scan is interrupted.
+            pool.shutdown(wait=False, cancel_futures=True)
+            still_running = sum(1 for future in in_flight if future.running())
+            if still_running:
+                print(f"\n⏹ Scan interrupted, waiting for {still_running} in-flight check(s) to stop...", flush=True)
+            raise
+        pool.shutdown()
+
+        spinner.ok("✅")
+
+    return merge_task_results(tasks, results, tag_regions=tag_regions)
@@ -1,211 +1,260 @@
 from datetime import datetime, timezone, timedelta
 import boto3
 import botocore
-
-
-def check_idle_ec2_instances(session, region, idle_days=7, cpu_threshold=5, network_threshold=1000):
-    ec2 = session.client('ec2', region_name=region)
-    cloudwatch = session.client('cloudwatch', region_name=region)
+from modules.compute_modules.ec2_inventory import EC2Inventory
+from modules.core_modules.client_factory import get_client
+from modules.core_modules.pricing_cache import get_pricing_cache, parse_on_demand_price
+from modules.core_modules.pricing_engine import get_price_index, get_region_name
+from modules.core_modules.metrics_engine import average_datapoints, fetch_fleet_datapoints
+from modules.core_modules.scan_store import get_scan_store
+
+
+def fetch_idle_ec2_raw(session, region, idle_days=7, inventory=None):
+    """Raw facts for the idle instance rules: one record per non-terminated instance.
+
+    Each record carries the instance's average CPU and NetworkOut over the
+    last idle_days, so evaluate_idle_ec2 can be re-run with other
+    thresholds without contacting AWS. Both averages are None when the
+    CloudWatch metrics could not be read.
+    """
+    inventory = inventory or EC2Inventory(session, region)
+    cloudwatch = get_client(session, 'cloudwatch', region)
     now = datetime.now(timezone.utc)
-    idle_instances = []
+    records = []
 
     try:
-        response = ec2.describe_instances()
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instance_id = instance['InstanceId']
-                state = instance['State']['Name']
-                launch_time = instance['LaunchTime']
-                name = next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'N/A')
-
-                if state == 'terminated':
-                    continue
-
-                if state == 'stopped':
-                    idle_instances.append({
-                        'Resource ID': instance_id,
-                        'Name': name,
-                        'State': state,
-                        'Launch Time': str(launch_time),
-                        'Idle Days': idle_days,
-                        'CPU Avg (%)': 0.0,
-                        'NetworkOut Avg (Bytes)': 0.0,
-                        'Used?': 'No',
-                        'Suggestion': 'Instance is stopped. Consider terminating if not needed.'
-                    })
-                    continue
-
-                cpu_util = get_average_metric(cloudwatch, instance_id, 'CPUUtilization', idle_days, now)
-                network_out = get_average_metric(cloudwatch, instance_id, 'NetworkOut', idle_days, now)
-
-                is_idle = cpu_util < cpu_threshold and network_out < network_threshold
-
-                if is_idle:
-                    idle_instances.append({
-                        'Resource ID': instance_id,
-                        'Name': name,
-                        'State': state,
-                        'Launch Time': str(launch_time),
-                        'Idle Days': idle_days,
-                        'CPU Avg (%)': cpu_util,
-                        'NetworkOut Avg (Bytes)': network_out,
-                        'Used?': 'No',
-                        'Suggestion': 'Review and consider stopping or terminating due to low usage.'
-                    })
+        active = [inst for inst in inventory.instances() if inst['State']['Name'] not in ('terminated', 'stopped')]
+        try:
+            metrics = fetch_fleet_datapoints(
+                cloudwatch, 'AWS/EC2', 'InstanceId',
+                [inst['InstanceId'] for inst in active],
+                {'CPUUtilization': ['Average'], 'NetworkOut': ['Average']},
+                now - timedelta(days=idle_days), now,
+                store=get_scan_store(session),
+            )
+        except Exception as e:
+            print(f"[Error] CloudWatch metrics for EC2 instances: {e}")
+            metrics = None
+
+        for instance in inventory.instances():
+            if instance['State']['Name'] == 'terminated':
+                continue
+            record = {
+                'InstanceId': instance['InstanceId'],
+                'Name': next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'N/A'),
+                'State': instance['State']['Name'],
+                'LaunchTime': str(instance['LaunchTime']),
+                'IdleDays': idle_days,
+                'CPUAverage': None,
+                'NetworkOutAverage': None,
+            }
+            if metrics is not None:
+                instance_metrics = metrics.get(instance['InstanceId'], {})
+                record['CPUAverage'] = average_datapoints(instance_metrics.get('CPUUtilization', []))
+                record['NetworkOutAverage'] = average_datapoints(instance_metrics.get('NetworkOut', []))
+            records.append(record)
 
     except Exception as e:
         print(f"[Error] EC2 Check: {e}")
+    return records
 
-    return idle_instances
-
-
-def get_average_metric(cloudwatch_client, instance_id, metric_name, days, end_time):
-    start_time = end_time - timedelta(days=days)
-    try:
-        response = cloudwatch_client.get_metric_statistics(
-            Namespace='AWS/EC2',
-            MetricName=metric_name,
-            Dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=86400,
-            Statistics=['Average']
-        )
-        datapoints = response.get('Datapoints', [])
-        if not datapoints:
-            return 0.0
-        avg = sum(dp['Average'] for dp in datapoints) / len(datapoints)
-        return avg
-    except Exception as e:
-        print(f"[Error] CloudWatch metric {metric_name} for {instance_id}: {e}")
-        return 0.0
-
-
-def check_available_volumes(session, region):
-    ec2 = session.client('ec2', region_name=region)
-    available_volumes = []
 
+def evaluate_idle_ec2(record, cpu_threshold=5, network_threshold=1000):
+    """Report row for one fetch_idle_ec2_raw record, or None if the instance is in use."""
+    row = {
+        'Resource ID': record['InstanceId'],
+        'Name': record['Name'],
+        'State': record['State'],
+        'Launch Time': record['LaunchTime'],
+        'Idle Days': record['IdleDays'],
+    }
+    if record['State'] == 'stopped':
+        return {
+            **row,
+            'CPU Avg (%)': 0.0,
+            'NetworkOut Avg (Bytes)': 0.0,
+            'Used?': 'No',
+            'Suggestion': 'Instance is stopped. Consider terminating if not needed.'
+        }
+
+    cpu_util = record['CPUAverage']
+    network_out = record['NetworkOutAverage']
+    if cpu_util is None or network_out is None:
+        # Without metrics the instance can't be judged idle; flag it rather than guess.
+        return {
+            **row,
+            'CPU Avg (%)': 'Metrics unavailable',
+            'NetworkOut Avg (Bytes)': 'Metrics unavailable',
+            'Used?': 'Unknown',
+            'Suggestion': 'CloudWatch metrics could not be read (check cloudwatch:GetMetricData access). '
+                          'Usage not evaluated.'
+        }
+    if cpu_util < cpu_threshold and network_out < network_threshold:
+        return {
+            **row,
+            'CPU Avg (%)': cpu_util,
+            'NetworkOut Avg (Bytes)': network_out,
+            'Used?': 'No',
+            'Suggestion': 'Review and consider stopping or terminating due to low usage.'
+        }
+    return None
+
+
+def iter_idle_ec2_instances(session, region, idle_days=7, cpu_threshold=5, network_threshold=1000, inventory=None):
+    for record in fetch_idle_ec2_raw(session, region, idle_days, inventory):
+        row = evaluate_idle_ec2(record, cpu_threshold, network_threshold)
+        if row is not None:
+            yield row
+
+
+def check_idle_ec2_instances(session, region, idle_days=7, cpu_threshold=5, network_threshold=1000, inventory=None):
+    return list(iter_idle_ec2_instances(session, region, idle_days, cpu_threshold, network_threshold, inventory))
+
+
+def iter_available_volumes(session, region, inventory=None):
+    inventory = inventory or EC2Inventory(session, region)
     try:
-        volumes = ec2.describe_volumes(Filters=[{'Name': 'status', 'Values': ['available']}])
-        for vol in volumes['Volumes']:
-            available_volumes.append({
+        for vol in inventory.available_volumes():
+            yield {
                 'Resource ID': vol['VolumeId'],
                 'Size (GiB)': vol['Size'],
                 'State': vol['State'],
                 'Created Time': str(vol['CreateTime']),
                 'Used?': 'No',
                 'Suggestion': 'Delete if not needed.'
-            })
+            }
     except Exception as e:
         print(f"[Error] Volume Check: {e}")
 
-    return available_volumes
 
+def check_available_volumes(session, region, inventory=None):
+    return list(iter_available_volumes(session, region, inventory))
 
-def check_old_amis(session, region, ami_days=30):
-    ec2 = session.client('ec2', region_name=region)
+
+def iter_old_amis(session, region, ami_days=30, inventory=None):
+    inventory = inventory or EC2Inventory(session, region)
     now = datetime.now(timezone.utc)
     threshold = timedelta(days=ami_days)
-    old_amis = []
 
     try:
-        images = ec2.describe_images(Owners=['self'])['Images']
-        for image in images:
+        usage = inventory.ami_usage_index()
+        for image in inventory.images():
             creation_time = datetime.strptime(image['CreationDate'], "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
             age = now - creation_time
             if age > threshold:
-                old_amis.append({
+                yield {
                     'Resource ID': image['ImageId'],
                     'Name': image.get('Name', 'N/A'),
                     'Creation Date': image['CreationDate'],
                     'Snapshot IDs': ", ".join([bdm.get('Ebs', {}).get('SnapshotId', 'N/A') for bdm in image.get('BlockDeviceMappings', [])]),
                     'Idle Days': age.days,
-                    'Used?': 'Unknown',
+                    'Referenced By': ', '.join(usage.get(image['ImageId'], [])) or 'N/A',
+                    'Used?': 'Yes' if image['ImageId'] in usage else 'No',
                     'Suggestion': 'Deregister AMI and manually delete snapshots if unused.'
-                })
+                }
     except Exception as e:
         print(f"[Error] AMI Check: {e}")
 
-    return old_amis
 
+def check_old_amis(session, region, ami_days=30, inventory=None):
+    return list(iter_old_amis(session, region, ami_days, inventory))
 
-def check_unassociated_elastic_ips(session, region):
-    ec2 = session.client('ec2', region_name=region)
-    unassoc_ips = []
 
+def iter_unassociated_elastic_ips(session, region, inventory=None):
+    inventory = inventory or EC2Inventory(session, region)
     try:
-        addresses = ec2.describe_addresses()
-        for addr in addresses['Addresses']:
+        for addr in inventory.iter_addresses():
             if 'InstanceId' not in addr and 'NetworkInterfaceId' not in addr:
-                unassoc_ips.append({
+                yield {
                     'Resource ID': addr.get('AllocationId', 'N/A'),
                     'Public IP': addr.get('PublicIp'),
                     'Domain': addr.get('Domain'),
                     'Used?': 'No',
                     'Suggestion': 'Release unused Elastic IP to avoid charges.'
-                })
+                }
     except Exception as e:
         print(f"[Error] EIP Check: {e}")
 
-    return unassoc_ips
+
+def check_unassociated_elastic_ips(session, region, inventory=None):
+    return list(iter_unassociated_elastic_ips(session, region, inventory))
 
 
-def check_orphan_snapshots(session, region):
-    ec2 = session.client('ec2', region_name=region)
-    orphan_snapshots = []
+def classify_snapshot(snap, ami_snapshots, volume_ids):
+    """Return (status, used, referenced by) for a snapshot against the AMI and volume indexes."""
+    image_ids = ami_snapshots.get(snap['SnapshotId'])
+    if image_ids:
+        return 'AMI-backed', 'Yes', ', '.join(image_ids)
+    if snap.get('VolumeId') in volume_ids:
+        return 'Source volume exists', 'Yes', snap['VolumeId']
+    return 'Orphaned', 'No', 'N/A'
 
+
+SNAPSHOT_SUGGESTIONS = {
+    'AMI-backed': 'Backs an AMI. Deregister the AMI first if it is no longer needed.',
+    'Source volume exists': 'Backup of an existing volume. Keep per your retention policy.',
+    'Orphaned': 'Source volume is gone and no AMI uses it. Delete if not needed.',
+}
+
+
+def iter_orphan_snapshots(session, region, inventory=None):
+    """Classify every snapshot in one pass against the AMI and volume indexes, with no per-snapshot calls."""
+    inventory = inventory or EC2Inventory(session, region)
     try:
-        snapshots = ec2.describe_snapshots(OwnerIds=['self'])['Snapshots']
-        for snap in snapshots:
-            orphan_snapshots.append({
+        ami_snapshots = inventory.ami_snapshot_index()
+        volume_ids = inventory.volume_ids()
+        for snap in inventory.iter_snapshots():
+            status, used, referenced_by = classify_snapshot(snap, ami_snapshots, volume_ids)
+            yield {
                 'Resource ID': snap['SnapshotId'],
                 'Volume ID': snap.get('VolumeId', 'N/A'),
                 'Start Time': str(snap['StartTime']),
                 'Size (GiB)': snap['VolumeSize'],
                 'Description': snap.get('Description', 'N/A'),
-                'Used?': 'Unknown',
-                'Suggestion': 'Delete if snapshot is orphan and not used by AMI or restore point.'
-            })
+                'Status': status,
+                'Referenced By': referenced_by,
+                'Used?': used,
+                'Suggestion': SNAPSHOT_SUGGESTIONS[status]
+            }
     except Exception as e:
         print(f"[Error] Snapshot Check: {e}")
 
-    return orphan_snapshots
 
+def check_orphan_snapshots(session, region, inventory=None):
+    return list(iter_orphan_snapshots(session, region, inventory))
 
-def check_unattached_enis(session, region):
-    ec2 = session.client('ec2', region_name=region)
-    results = []
+
+def iter_unattached_enis(session, region, inventory=None):
+    inventory = inventory or EC2Inventory(session, region)
     try:
-        enis = ec2.describe_network_interfaces(Filters=[{'Name': 'status', 'Values': ['available']}])
-        for eni in enis['NetworkInterfaces']:
-            results.append({
+        for eni in inventory.iter_network_interfaces(filters=[{'Name': 'status', 'Values': ['available']}]):
+            yield {
                 'Resource ID': eni['NetworkInterfaceId'],
                 'Description': eni.get('Description', 'N/A'),
                 'Used?': 'No',
                 'Suggestion': 'Delete unattached ENI to avoid unnecessary charges.'
-            })
+            }
     except Exception as e:
         print(f"[Error] ENI Check: {e}")
-    return results
 
 
-def check_reserved_instance_utilization(session, region):
-    ec2 = session.client('ec2', region_name=region)
+def check_unattached_enis(session, region, inventory=None):
+    return list(iter_unattached_enis(session, region, inventory))
+
+
+def check_reserved_instance_utilization(session, region, inventory=None):
+    inventory = inventory or EC2Inventory(session, region)
     report = []
     try:
-        reserved = ec2.describe_reserved_instances(Filters=[{'Name': 'state', 'Values': ['active']}])
-        instances = ec2.describe_instances(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}])
-
         reserved_counts = {}
-        for ri in reserved['ReservedInstances']:
+        for ri in inventory.active_reserved_instances():
             key = (ri['InstanceType'], ri['AvailabilityZone'])
             reserved_counts[key] = reserved_counts.get(key, 0) + ri['InstanceCount']
 
         running_counts = {}
-        for res in instances['Reservations']:
-            for inst in res['Instances']:
-                key = (inst['InstanceType'], inst['Placement']['AvailabilityZone'])
-                running_counts[key] = running_counts.get(key, 0) + 1
+        for inst in inventory.running_instances():
+            key = (inst['InstanceType'], inst['Placement']['AvailabilityZone'])
+            running_counts[key] = running_counts.get(key, 0) + 1
 
         for key in reserved_counts:
             used = running_counts.get(key, 0)
@@ -223,18 +272,19 @@ def check_reserved_instance_utilization(session, region):
     return report
 
 
-def check_instance_store_backed_amis(session, region):
-    ec2 = session.client('ec2', region_name=region)
+def check_instance_store_backed_amis(session, region, inventory=None):
+    inventory = inventory or EC2Inventory(session, region)
     results = []
     try:
-        images = ec2.describe_images(Owners=['self'])['Images']
-        for image in images:
+        usage = inventory.ami_usage_index()
+        for image in inventory.images():
             for bdm in image.get('BlockDeviceMappings', []):
                 if 'Ebs' not in bdm:
                     results.append({
                         'Resource ID': image['ImageId'],
                         'Name': image.get('Name', 'N/A'),
-                        'Used?': 'Unknown',
+                        'Referenced By': ', '.join(usage.get(image['ImageId'], [])) or 'N/A',
+                        'Used?': 'Yes' if image['ImageId'] in usage else 'No',
                         'Suggestion': 'Instance store-backed AMI. Check for leftover snapshots or data.'
                     })
                     break
@@ -243,77 +293,90 @@ def check_instance_store_backed_amis(session, region):
     return results
 
 
-def report_running_instance_costs(session, region):
-    ec2 = session.client('ec2', region_name=region)
-    pricing = session.client('pricing', region_name='us-east-1')
+# Pricing API attribute values for EC2 PlatformDetails and Placement.Tenancy.
+PLATFORM_OPERATING_SYSTEMS = {
+    'Linux/UNIX': 'Linux',
+    'Red Hat Enterprise Linux': 'RHEL',
+    'SUSE Linux': 'SUSE',
+    'Ubuntu Pro': 'Ubuntu Pro',
+}
+TENANCIES = {'default': 'Shared', 'dedicated': 'Dedicated', 'host': 'Host'}
+HOURS_PER_MONTH = 730
+
+
+def get_instance_operating_system(instance):
+    platform = instance.get('PlatformDetails') or ('Windows' if instance.get('Platform') == 'windows' else 'Linux/UNIX')
+    if platform.startswith('Windows'):
+        return 'Windows'
+    return PLATFORM_OPERATING_SYSTEMS.get(platform, 'Linux')
+
+
+def fetch_ec2_hourly_price(pricing_client, instance_type, region, operating_system='Linux', tenancy='Shared'):
+    price_resp = pricing_client.get_products(
+        ServiceCode='AmazonEC2',
+        Filters=[
+            {'Type': 'TERM_MATCH', 'Field': 'instanceType', 'Value': instance_type},
+            {'Type': 'TERM_MATCH', 'Field': 'location', 'Value': get_region_name(region)},
+            {'Type': 'TERM_MATCH', 'Field': 'operatingSystem', 'Value': operating_system},
+            {'Type': 'TERM_MATCH', 'Field': 'tenancy', 'Value': tenancy},
+            {'Type': 'TERM_MATCH', 'Field': 'preInstalledSw', 'Value': 'NA'},
+            {'Type': 'TERM_MATCH', 'Field': 'capacitystatus', 'Value': 'Used'},
+            {'Type': 'TERM_MATCH', 'Field': 'licenseModel', 'Value': 'No License required'},
+        ],
+        MaxResults=1
+    )
+    for offer in price_resp['PriceList']:
+        return parse_on_demand_price(offer)
+    return None
+
+
+def report_running_instance_costs(session, region, inventory=None, pricing_cache=None, price_index=None):
+    """Price running instances from the offline price index if one is loaded, else the Pricing API."""
+    inventory = inventory or EC2Inventory(session, region)
+    pricing_cache = pricing_cache or get_pricing_cache()
+    price_index = price_index or get_price_index()
+    pricing = get_client(session, 'pricing', 'us-east-1')
+    # Lookups that failed in this run; the same failing call isn't repeated for every instance.
+    failed_lookups = set()
+
+    def hourly_price(instance_type, operating_system, tenancy):
+        if price_index is not None:
+            return price_index.ec2_hourly_price(instance_type, region, operating_system, tenancy)
+        key = (instance_type, operating_system, tenancy)
+        if key in failed_lookups:
+            return None
+        try:
+            return pricing_cache.get_or_fetch(
+                instance_type, region, operating_system, tenancy,
+                lambda: fetch_ec2_hourly_price(pricing, instance_type, region, operating_system, tenancy),
+            )
+        except botocore.exceptions.ClientError:
+            failed_lookups.add(key)
+            return None
+
     costs = []
     try:
-        reservations = ec2.describe_instances(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}])
-        for res in reservations['Reservations']:
-            for inst in res['Instances']:
-                instance_type = inst['InstanceType']
-                az = inst['Placement']['AvailabilityZone']
-                region_name = region
-                try:
-                    price_resp = pricing.get_products(
-                        ServiceCode='AmazonEC2',
-                        Filters=[
-                            {'Type': 'TERM_MATCH', 'Field': 'instanceType', 'Value': instance_type},
-                            {'Type': 'TERM_MATCH', 'Field': 'location', 'Value': get_region_name(region)}
-                        ],
-                        MaxResults=1
-                    )
-                    price = 'N/A'
-                    for offer in price_resp['PriceList']:
-                        price = offer
-                        break
-                except botocore.exceptions.ClientError:
-                    price = 'Unknown'
-
-                costs.append({
-                    'Resource ID': inst['InstanceId'],
-                    'Instance Type': instance_type,
-                    'AZ': az,
-                    'Estimated Cost Info': price,
-                    'Suggestion': 'Review usage if not fully utilized.'
-                })
+        for inst in inventory.running_instances():
+            instance_type = inst['InstanceType']
+            az = inst['Placement']['AvailabilityZone']
+            operating_system = get_instance_operating_system(inst)
+            tenancy = TENANCIES.get(inst['Placement'].get('Tenancy', 'default'), 'Shared')
+            hourly = hourly_price(instance_type, operating_system, tenancy)
+
+            costs.append({
+                'Resource ID': inst['InstanceId'],
+                'Instance Type': instance_type,
+                'AZ': az,
+                'Operating System': operating_system,
+                'Hourly Price (USD)': hourly if hourly is not None else 'Unknown',
+                'Est. Monthly Cost (USD)': round(hourly * HOURS_PER_MONTH, 2) if hourly is not None else 'Unknown',
+                'Suggestion': 'Review usage if not fully utilized.'
+            })
     except Exception as e:
         print(f"[Error] Running Instance Cost Report: {e}")
+    finally:
+        try:
+            pricing_cache.save()
+        except OSError as e:
+            print(f"[Error] Saving pricing cache: {e}")
     return costs
-
-def get_region_name(region_code):
-    region_map = {
-        'us-east-1': 'US East (N. Virginia)',
-        'us-east-2': 'US East (Ohio)',
-        'us-west-1': 'US West (N. California)',
-        'us-west-2': 'US West (Oregon)',
-        'af-south-1': 'Africa (Cape Town)',
-        'ap-east-1': 'Asia Pacific (Hong Kong)',
-        'ap-south-2': 'Asia Pacific (Hyderabad)',
-        'ap-southeast-3': 'Asia Pacific (Jakarta)',
-        'ap-southeast-5': 'Asia Pacific (Malaysia)',
-        'ap-southeast-4': 'Asia Pacific (Melbourne)',
-        'ap-south-1': 'Asia Pacific (Mumbai)',
-        'ap-northeast-3': 'Asia Pacific (Osaka)',
-        'ap-northeast-2': 'Asia Pacific (Seoul)',
-        'ap-southeast-1': 'Asia Pacific (Singapore)',
-        'ap-southeast-2': 'Asia Pacific (Sydney)',
-        'ap-southeast-7': 'Asia Pacific (Thailand)',
-        'ap-northeast-1': 'Asia Pacific (Tokyo)',
-        'ca-central-1': 'Canada (Central)',
-        'ca-west-1': 'Canada West (Calgary)',
-        'eu-central-1': 'Europe (Frankfurt)',
-        'eu-west-1': 'Europe (Ireland)',
-        'eu-west-2': 'Europe (London)',
-        'eu-south-1': 'Europe (Milan)',
-        'eu-west-3': 'Europe (Paris)',
-        'eu-south-2': 'Europe (Spain)',
-        'eu-north-1': 'Europe (Stockholm)',
-        'eu-central-2': 'Europe (Zurich)',
-        'il-central-1': 'Israel (Tel Aviv)',
-        'mx-central-1': 'Mexico (Central)',
-        'me-south-1': 'Middle East (Bahrain)',
-        'me-central-1': 'Middle East (UAE)',
-        'sa-east-1': 'South America (São Paulo)'
-    }
-    return region_map.get(region_code, region_code)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import threading
+from botocore.exceptions import ClientError
+from modules.core_modules.client_factory import get_client
+from modules.core_modules.scan_store import get_scan_store
+
+
+class EC2Inventory:
+    """Scan-scoped cache of EC2 describe calls for a single region.
+
+    Each resource collection is fetched at most once, on first use, and the
+    same data is handed to every check that asks for it. Safe to share
+    between checks running on different threads.
+    """
+
+    def __init__(self, session, region):
+        self.session = session
+        self.region = region
+        self._cache = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ec2(self):
+        return get_client(self.session, 'ec2', self.region)
+
+    def _memoize(self, key, loader):
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Other collections can load in parallel; callers of this one wait.
+        with key_lock:
+            if key not in self._cache:
+                self._cache[key] = loader()
+            return self._cache[key]
+
+    def _record(self, collection, items, id_key):
+        """Save a loaded collection to the scan store, when scans are being recorded."""
+        store = get_scan_store(self.session)
+        if store is not None:
+            store.save_inventory(self.region, collection, items, id_key)
+        return items
+
+    def paginate(self, operation, result_key, **params):
+        """Yield items of a paginated describe call page by page, never holding the full response."""
+        paginator = self.ec2.get_paginator(operation)
+        for page in paginator.paginate(**params):
+            yield from page.get(result_key, [])
+
+    # Collections read by several checks are memoized as item lists.
+
+    def instances(self):
+        """All instances in the region, in every state, flattened out of reservations."""
+        def load():
+            instances = [
+                inst
+                for res in self.paginate('describe_instances', 'Reservations')
+                for inst in res['Instances']
+            ]
+            return self._record('instances', instances, 'InstanceId')
+        return self._memoize('instances', load)
+
+    def images(self):
+        def load():
+            return self._record('images', list(self.paginate('describe_images', 'Images', Owners=['self'])), 'ImageId')
+        return self._memoize('images', load)
+
+    def volumes(self):
+        """Every volume in the region, in any state."""
+        return self._memoize('volumes', lambda: list(self.paginate('describe_volumes', 'Volumes')))
+
+    def available_volumes(self):
+        return [vol for vol in self.volumes() if vol['State'] == 'available']
+
+    def running_instances(self):
+        return [inst for inst in self.instances() if inst['State']['Name'] == 'running']
+
+    def active_reserved_instances(self):
+        return self._memoize(
+            'active_reserved_instances',
+            lambda: self.ec2.describe_reserved_instances(
+                Filters=[{'Name': 'state', 'Values': ['active']}]
+            )['ReservedInstances'],
+        )
+
+    # Cross-resource indexes, built from the collections above for O(1) joins.
+
+    def volume_ids(self):
+        """IDs of every volume in the region, in any state."""
+        return self._memoize('volume_ids', lambda: {vol['VolumeId'] for vol in self.volumes()})
+
+    def ami_snapshot_index(self):
+        """Snapshot ID -> IDs of the region's own AMIs whose block device mappings use it."""
+        def load():
+            index = {}
+            for image in self.images():
+                for bdm in image.get('BlockDeviceMappings', []):
+                    snapshot_id = bdm.get('Ebs', {}).get('SnapshotId')
+                    if snapshot_id:
+                        index.setdefault(snapshot_id, []).append(image['ImageId'])
+            return index
+        return self._memoize('ami_snapshot_index', load)
+
+    def ami_usage_index(self):
+        """AMI ID -> sorted IDs of the instances, launch templates and launch configurations using it.
+
+        Built from three paginated bulk reads: every non-terminated
+        instance, the $Latest and $Default version of every launch
+        template, and every Auto Scaling launch configuration. A source
+        that cannot be read is reported and left out of the index.
+        """
+        def load():
+            index = {}
+
+            def add(image_id, resource):
+                if image_id:
+                    index.setdefault(image_id, set()).add(resource)
+
+            for inst in self.instances():
+                if inst['State']['Name'] != 'terminated':
+                    add(inst.get('ImageId'), inst['InstanceId'])
+
+            try:
+                # Without a template ID these versions are returned for every template in the region.
+                for version in self.paginate('describe_launch_template_versions', 'LaunchTemplateVersions',
+                                             Versions=['$Latest', '$Default']):
+                    add(version.get('LaunchTemplateData', {}).get('ImageId'),
+                        f"{version['LaunchTemplateId']} (v{version['VersionNumber']})")
+            except ClientError as e:
+                print(f"[Error] Launch template scan in {self.region}: {e}")
+
+            try:
+                autoscaling = get_client(self.session, 'autoscaling', self.region)
+                for page in autoscaling.get_paginator('describe_launch_configurations').paginate():
+                    for config in page.get('LaunchConfigurations', []):
+                        add(config.get('ImageId'), config['LaunchConfigurationName'])
+            except ClientError as e:
+                print(f"[Error] Launch configuration scan in {self.region}: {e}")
+
+            return {image_id: sorted(resources) for image_id, resources in index.items()}
+        return self._memoize('ami_usage_index', load)
+
+    # Collections read by a single check are streamed instead.
+
+    def iter_snapshots(self):
+        return self.paginate('describe_snapshots', 'Snapshots', OwnerIds=['self'])
+
+    def iter_network_interfaces(self, filters=None):
+        return self.paginate('describe_network_interfaces', 'NetworkInterfaces', Filters=filters or [])
+
+    def iter_addresses(self):
+        # DescribeAddresses is not paginated; it always returns every address.
+        yield from self.ec2.describe_addresses()['Addresses']
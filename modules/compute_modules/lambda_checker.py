@@ -2,12 +2,30 @@ import boto3
 import datetime
 from datetime import timezone
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from modules.core_modules.metrics_engine import fetch_fleet_datapoints
+from modules.core_modules.client_factory import get_client
+from modules.core_modules.scan_store import get_scan_store
 
 CLOUDWATCH_NAMESPACE = 'AWS/Lambda'
+DEFAULT_POLICY_WORKERS = 8
+# Only the statistics the audit actually reads are requested.
+LAMBDA_METRIC_STATS = {
+    'Invocations': ['Sum'],
+    'Duration': ['Average', 'Maximum'],
+    'Errors': ['Sum'],
+}
+# The only configuration fields the Lambda rules read. Everything else, the
+# Environment variables in particular, stays out of the raw data written to disk.
+RAW_CONFIG_FIELDS = (
+    'FunctionName', 'FunctionArn', 'Runtime', 'MemorySize', 'Timeout', 'Layers', 'LastModified',
+    'DeadLetterConfig', 'ProvisionedConcurrentExecutions', 'ReservedConcurrentExecutions',
+)
 
 
 def list_all_lambdas(session, region):
-    client = session.client('lambda', region_name=region)
+    client = get_client(session, 'lambda', region)
     paginator = client.get_paginator('list_functions')
     lambdas = []
     for page in paginator.paginate():
@@ -15,43 +33,83 @@ def list_all_lambdas(session, region):
     return lambdas
 
 
-def get_function_configuration(session, region, function_name):
-    client = session.client('lambda', region_name=region)
-    return client.get_function_configuration(FunctionName=function_name)
+def unqualified_function_arn(function_arn):
+    # arn:aws:lambda:region:account:function:name[:qualifier]
+    return ':'.join(function_arn.split(':')[:7])
 
 
-def check_event_triggers(session, region, function_name):
-    client = session.client('lambda', region_name=region)
-    mappings = client.list_event_source_mappings(FunctionName=function_name)
-    policy = {}
+def index_event_source_mappings(session, region):
+    """One unfiltered, paginated pass over event source mappings, indexed by function ARN."""
+    client = get_client(session, 'lambda', region)
+    paginator = client.get_paginator('list_event_source_mappings')
+    mappings_by_function = defaultdict(list)
+    for page in paginator.paginate():
+        for mapping in page['EventSourceMappings']:
+            mappings_by_function[unqualified_function_arn(mapping['FunctionArn'])].append(mapping)
+    return mappings_by_function
+
+
+def get_function_policy(client, function_name):
     try:
-        policy = client.get_policy(FunctionName=function_name)
+        return client.get_policy(FunctionName=function_name).get('Policy')
     except client.exceptions.ResourceNotFoundException:
-        pass
-    return mappings['EventSourceMappings'], policy.get('Policy')
+        return None
+    except ClientError as e:
+        print(f"[Error] Lambda policy for {function_name}: {e}")
+        return None
+
+
+def fetch_function_policies(session, region, function_names, max_workers=DEFAULT_POLICY_WORKERS):
+    """Resource policies have no bulk API, so fetch them one per function on a bounded pool."""
+    client = get_client(session, 'lambda', region)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        policies = pool.map(lambda name: get_function_policy(client, name), function_names)
+        return dict(zip(function_names, policies))
+
+
+def fetch_changed_function_policies(session, region, functions, store, max_workers=DEFAULT_POLICY_WORKERS):
+    """Reuse stored policies of functions whose RevisionId is unchanged; fetch only the rest.
+
+    Adding or removing a permission changes a function's RevisionId, so an
+    unchanged revision means an unchanged policy.
+    """
+    known = store.lambda_policies(region)
+    policies = {}
+    changed = []
+    for fn in functions:
+        cached = known.get(fn['FunctionArn'])
+        if cached and cached[0] == fn.get('RevisionId'):
+            policies[fn['FunctionName']] = cached[1]
+        else:
+            changed.append(fn)
 
+    fetched = fetch_function_policies(session, region, [fn['FunctionName'] for fn in changed], max_workers)
+    policies.update(fetched)
+    store.save_lambda_policies(region, {
+        fn['FunctionArn']: (fn['RevisionId'], fetched[fn['FunctionName']])
+        for fn in changed if fn.get('RevisionId')
+    })
+    return policies
 
-def fetch_cloudwatch_metrics(session, region, function_name, days=30):
-    cloudwatch = session.client('cloudwatch', region_name=region)
-    end = datetime.datetime.utcnow()
-    start = end - datetime.timedelta(days=days)
 
-    metrics = ['Invocations', 'Duration', 'Errors']
-    stats = {}
+def fetch_fleet_lambda_metrics(session, region, function_names, days=30):
+    """Fetch Invocations, Duration and Errors for every function in batched GetMetricData calls.
 
-    for metric in metrics:
-        response = cloudwatch.get_metric_statistics(
-            Namespace=CLOUDWATCH_NAMESPACE,
-            MetricName=metric,
-            Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-            StartTime=start,
-            EndTime=end,
-            Period=86400,
-            Statistics=['Sum', 'Average', 'Maximum']
-        )
-        stats[metric] = response['Datapoints']
+    Returns {function_name: {metric: [datapoint, ...]}}, the same per-function
+    stats dict that fetch_cloudwatch_metrics returns.
+    """
+    cloudwatch = get_client(session, 'cloudwatch', region)
+    end = datetime.datetime.now(timezone.utc)
+    start = end - datetime.timedelta(days=days)
+    return fetch_fleet_datapoints(
+        cloudwatch, CLOUDWATCH_NAMESPACE, 'FunctionName', function_names,
+        LAMBDA_METRIC_STATS, start, end,
+        store=get_scan_store(session),
+    )
 
-    return stats
+
+def fetch_cloudwatch_metrics(session, region, function_name, days=30):
+    return fetch_fleet_lambda_metrics(session, region, [function_name], days)[function_name]
 
 
 def detect_unused_lambda(metrics):
@@ -72,9 +130,9 @@ def detect_edge_functions(config):
     return config.get('Runtime', '').startswith('nodejs') and 'cloudfront' in config.get('FunctionArn', '')
 
 
-def evaluate_lambda_layers(config):
+def evaluate_lambda_layers(config, max_layers=3):
     layers = config.get('Layers', [])
-    return [layer['Arn'] for layer in layers], len(layers) > 3
+    return [layer['Arn'] for layer in layers], len(layers) > max_layers
 
 
 def get_last_modified_days(config):
@@ -91,7 +149,8 @@ def validate_dlq(config, metrics):
     return has_errors and not dlq_config
 
 
-def generate_suggestions(config, metrics, unused, edge, layer_count_too_high):
+def generate_suggestions(config, metrics, unused, edge, layer_count_too_high, oversized_memory_mb=512,
+                         low_avg_duration_ms=200, high_timeout_s=60, low_max_duration_ms=1000, stale_days=180):
     suggestions = []
     memory = config['MemorySize']
     timeout = config.get('Timeout', 3)
@@ -103,10 +162,10 @@ def generate_suggestions(config, metrics, unused, edge, layer_count_too_high):
     if unused:
         suggestions.append("Unused function. Consider deleting or archiving.")
 
-    if memory > 512 and avg_duration < 200:
+    if memory > oversized_memory_mb and avg_duration < low_avg_duration_ms:
         suggestions.append("Over-provisioned memory. Consider downsizing.")
 
-    if timeout > 60 and max_duration < 1000:
+    if timeout > high_timeout_s and max_duration < low_max_duration_ms:
         suggestions.append("Timeout is high relative to max execution duration. Consider reducing it.")
 
     if layer_count_too_high:
@@ -129,48 +188,72 @@ def generate_suggestions(config, metrics, unused, edge, layer_count_too_high):
         suggestions.append("Lambda@Edge function. Review for duplication and necessity.")
 
     last_modified_days = get_last_modified_days(config)
-    if last_modified_days and last_modified_days > 180:
-        suggestions.append("Function hasn't been modified in over 6 months. Review its relevance.")
+    if last_modified_days and last_modified_days > stale_days:
+        # Keep the wording of earlier reports at the default threshold.
+        period = "6 months" if stale_days == 180 else f"{stale_days} days"
+        suggestions.append(f"Function hasn't been modified in over {period}. Review its relevance.")
 
     return suggestions
 
 
-def audit_lambda_functions(session, region, days=30):
-    results = []
+def fetch_lambda_raw(session, region, days=30):
+    """Raw facts for the Lambda rules: configuration, metrics and triggers of every function."""
     all_lambdas = list_all_lambdas(session, region)
-
+    function_names = [fn['FunctionName'] for fn in all_lambdas]
+    fleet_metrics = fetch_fleet_lambda_metrics(session, region, function_names, days)
+    mappings_by_function = index_event_source_mappings(session, region)
+    store = get_scan_store(session)
+    if store is not None:
+        store.save_inventory(region, 'lambda_functions', all_lambdas, 'FunctionArn')
+        policies = fetch_changed_function_policies(session, region, all_lambdas, store)
+    else:
+        policies = fetch_function_policies(session, region, function_names)
+
+    records = []
     for fn in all_lambdas:
-        name = fn['FunctionName']
-        config = get_function_configuration(session, region, name)
-        triggers, policy = check_event_triggers(session, region, name)
-        metrics = fetch_cloudwatch_metrics(session, region, name, days)
-
-        unused = detect_unused_lambda(metrics)
-        edge = detect_edge_functions(config)
-        layers, too_many_layers = evaluate_lambda_layers(config)
-        last_modified_days = get_last_modified_days(config)
-
-        duration_data = metrics.get('Duration', [])
-        avg_duration = sum(d.get('Average', 0) for d in duration_data) / len(duration_data) if duration_data else 0
-        invocations = sum(d.get('Sum', 0) for d in metrics.get('Invocations', []))
-
-        suggestions = generate_suggestions(config, metrics, unused, edge, too_many_layers)
-
-        results.append({
-            'FunctionName': name,
-            'Runtime': config.get('Runtime'),
-            'MemorySize': config.get('MemorySize'),
-            'Timeout': config.get('Timeout'),
-            'AvgDuration': round(avg_duration, 2),
-            'Invocations': invocations,
-            'Unused': unused,
-            'IsEdgeFunction': edge,
-            'Layers': layers,
+        triggers = mappings_by_function.get(unqualified_function_arn(fn['FunctionArn']), [])
+        records.append({
+            'Config': {key: fn[key] for key in RAW_CONFIG_FIELDS if key in fn},
+            'Metrics': fleet_metrics[fn['FunctionName']],
             'Triggers': [t['EventSourceArn'] for t in triggers],
-            'LastModifiedDaysAgo': last_modified_days,
-            'ProvisionedConcurrency': config.get('ProvisionedConcurrentExecutions'),
-            'ReservedConcurrency': config.get('ReservedConcurrentExecutions'),
-            'Suggestions': suggestions
+            'Policy': policies.get(fn['FunctionName']),
         })
+    return records
+
+
+def evaluate_lambda_function(record, max_layers=3, **suggestion_thresholds):
+    """Report row for one fetch_lambda_raw record; thresholds are passed on to generate_suggestions."""
+    config = record['Config']
+    metrics = record['Metrics']
+
+    unused = detect_unused_lambda(metrics)
+    edge = detect_edge_functions(config)
+    layers, too_many_layers = evaluate_lambda_layers(config, max_layers)
+    last_modified_days = get_last_modified_days(config)
 
-    return results
+    duration_data = metrics.get('Duration', [])
+    avg_duration = sum(d.get('Average', 0) for d in duration_data) / len(duration_data) if duration_data else 0
+    invocations = sum(d.get('Sum', 0) for d in metrics.get('Invocations', []))
+
+    suggestions = generate_suggestions(config, metrics, unused, edge, too_many_layers, **suggestion_thresholds)
+
+    return {
+        'FunctionName': config['FunctionName'],
+        'Runtime': config.get('Runtime'),
+        'MemorySize': config.get('MemorySize'),
+        'Timeout': config.get('Timeout'),
+        'AvgDuration': round(avg_duration, 2),
+        'Invocations': invocations,
+        'Unused': unused,
+        'IsEdgeFunction': edge,
+        'Layers': layers,
+        'Triggers': record['Triggers'],
+        'LastModifiedDaysAgo': last_modified_days,
+        'ProvisionedConcurrency': config.get('ProvisionedConcurrentExecutions'),
+        'ReservedConcurrency': config.get('ReservedConcurrentExecutions'),
+        'Suggestions': suggestions
+    }
+
+
+def audit_lambda_functions(session, region, days=30):
+    return [evaluate_lambda_function(record) for record in fetch_lambda_raw(session, region, days)]
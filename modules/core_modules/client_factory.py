@@ -0,0 +1,94 @@
+import threading
+import weakref
+from botocore.config import Config
+from modules.core_modules.rate_limiter import RateLimiter
+
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_RETRY_MODE = 'adaptive'
+DEFAULT_MAX_ATTEMPTS = 10
+
+RETRY_MODES = ('standard', 'adaptive')
+
+
+def validate_retry_mode(retry_mode):
+    if retry_mode not in RETRY_MODES:
+        raise ValueError(f"Unsupported retry mode '{retry_mode}', expected 'standard' or 'adaptive'.")
+    return retry_mode
+
+
+class ScanCancelled(Exception):
+    """Raised by API calls made after the scan was interrupted."""
+
+
+class ClientRegistry:
+    """Thread-safe cache of boto3 clients keyed by (service, region).
+
+    Every client shares one botocore Config, so concurrent checks reuse warm
+    pooled connections instead of creating a client (and a TLS handshake)
+    per call. Every client is also throttled by the registry's rate limiter,
+    and handed to the interceptor (a ScanRecorder or ScanReplayer) if set.
+    Once cancel_event is set, every further API call raises ScanCancelled,
+    so checks still running after an interrupt stop at their next call.
+    """
+
+    def __init__(self, session, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 retry_mode=DEFAULT_RETRY_MODE, max_attempts=DEFAULT_MAX_ATTEMPTS, rate_limiter=None,
+                 interceptor=None, cancel_event=None):
+        self.session = session
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': validate_retry_mode(retry_mode), 'max_attempts': max_attempts},
+        )
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.interceptor = interceptor
+        self.cancel_event = cancel_event
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, service_name, region_name=None):
+        region_name = region_name or self.session.region_name
+        key = (service_name, region_name)
+        # boto3 Sessions are not thread-safe, so client creation is serialized.
+        with self._lock:
+            if key not in self._clients:
+                client = self.session.client(service_name, region_name=region_name, config=self.config)
+                if self.cancel_event is not None:
+                    client.meta.events.register('before-parameter-build', self._check_cancelled)
+                self.rate_limiter.attach(client)
+                if self.interceptor is not None:
+                    self.interceptor.attach(client)
+                self._clients[key] = client
+            return self._clients[key]
+
+    def _check_cancelled(self, model, **kwargs):
+        if self.cancel_event.is_set():
+            raise ScanCancelled(f"{model.name} skipped: the scan was interrupted.")
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+def configure_clients(session, **settings):
+    """Create (or replace) the client registry used for session."""
+    registry = ClientRegistry(session, **settings)
+    with _registries_lock:
+        _registries[session] = registry
+    return registry
+
+
+def get_registry(session):
+    with _registries_lock:
+        registry = _registries.get(session)
+        if registry is None:
+            registry = _registries[session] = ClientRegistry(session)
+        return registry
+
+
+def get_client(session, service_name, region_name=None):
+    return get_registry(session).client(service_name, region_name)
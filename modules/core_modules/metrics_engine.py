@@ -0,0 +1,151 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# GetMetricData accepts at most 500 metric queries per request.
+MAX_QUERIES_PER_REQUEST = 500
+
+
+def build_metric_query(query_id, namespace, metric_name, dimensions, stat, period=86400):
+    return {
+        'Id': query_id,
+        'MetricStat': {
+            'Metric': {
+                'Namespace': namespace,
+                'MetricName': metric_name,
+                'Dimensions': dimensions,
+            },
+            'Period': period,
+            'Stat': stat,
+        },
+        'ReturnData': True,
+    }
+
+
+def get_metric_data(cloudwatch_client, queries, start_time, end_time):
+    """Run metric queries in batches of 500, following NextToken for each batch.
+
+    Returns {query_id: [(timestamp, value), ...]} in ascending time order.
+    """
+    series = defaultdict(list)
+    paginator = cloudwatch_client.get_paginator('get_metric_data')
+    for offset in range(0, len(queries), MAX_QUERIES_PER_REQUEST):
+        batch = queries[offset:offset + MAX_QUERIES_PER_REQUEST]
+        pages = paginator.paginate(
+            MetricDataQueries=batch,
+            StartTime=start_time,
+            EndTime=end_time,
+            ScanBy='TimestampAscending',
+        )
+        for page in pages:
+            for result in page['MetricDataResults']:
+                series[result['Id']].extend(zip(result['Timestamps'], result['Values']))
+    return series
+
+
+def query_series(cloudwatch_client, namespace, dimension_name, series_keys, start_time, end_time, period=86400):
+    """Fetch [(timestamp, value), ...] for each (resource_id, metric, stat) in series_keys."""
+    queries = []
+    query_index = {}
+    for resource_id, metric_name, stat in series_keys:
+        query_id = f"q{len(queries)}"
+        query_index[query_id] = (resource_id, metric_name, stat)
+        dimensions = [{'Name': dimension_name, 'Value': resource_id}]
+        queries.append(build_metric_query(query_id, namespace, metric_name, dimensions, stat, period))
+
+    return {
+        query_index[query_id]: values
+        for query_id, values in get_metric_data(cloudwatch_client, queries, start_time, end_time).items()
+    }
+
+
+def align_to_period(timestamp, period):
+    return datetime.fromtimestamp(timestamp.timestamp() // period * period, tz=timezone.utc)
+
+
+def query_series_incremental(store, cloudwatch_client, namespace, dimension_name, series_keys,
+                             start_time, end_time, period=86400):
+    """Like query_series, but only asks CloudWatch for time not already in the scan store.
+
+    The window is aligned down to a period boundary. Datapoints whose
+    period has fully elapsed are final: they are saved, and the window they
+    cover is remembered per series, so the next scan reads them back from
+    the store and only queries from the end of that window onwards. The
+    current, still-filling period is always refetched. Stored datapoints
+    from before the window are dropped.
+    """
+    region = cloudwatch_client.meta.region_name
+    start_time = align_to_period(start_time, period)
+    final_before = min(align_to_period(datetime.now(timezone.utc), period), end_time)
+
+    windows = store.metric_windows(region, namespace, dimension_name, period)
+    by_fetch_start = defaultdict(list)
+    for key in series_keys:
+        covered = windows.get(key)
+        if covered and covered[0] <= start_time <= covered[1]:
+            by_fetch_start[max(covered[1], start_time)].append(key)
+        else:
+            by_fetch_start[start_time].append(key)
+
+    stored = store.load_datapoints(region, namespace, dimension_name, period, start_time, end_time)
+    series = {key: list(stored.get(key, [])) for key in series_keys}
+    fetched_final = {}
+    new_windows = {}
+    for fetch_start, keys in by_fetch_start.items():
+        if fetch_start < end_time:
+            fetched = query_series(cloudwatch_client, namespace, dimension_name, keys, fetch_start, end_time, period)
+        else:
+            fetched = {}
+        for key in keys:
+            # Stored points come from before fetch_start; drop any the store has from later.
+            points = [point for point in series[key] if point[0] < fetch_start] + fetched.get(key, [])
+            series[key] = points
+            fetched_final[key] = [point for point in fetched.get(key, []) if point[0] < final_before]
+            covered = windows.get(key)
+            covered_from = covered[0] if covered and fetch_start != start_time else start_time
+            new_windows[key] = (covered_from, max(final_before, fetch_start))
+
+    store.save_datapoints(region, namespace, dimension_name, period, fetched_final, new_windows, keep_from=start_time)
+    return series
+
+
+def fetch_fleet_datapoints(cloudwatch_client, namespace, dimension_name, resource_ids, metric_stats,
+                           start_time, end_time, period=86400, store=None):
+    """Fetch metrics for a whole fleet of resources in bulk.
+
+    metric_stats maps a metric name to the statistics wanted for it, e.g.
+    {'CPUUtilization': ['Average']}. Returns
+    {resource_id: {metric_name: [datapoint, ...]}} where each datapoint has
+    the same shape as a get_metric_statistics datapoint:
+    {'Timestamp': ..., 'Average': ..., ...}. With a scan store, windows
+    fetched by earlier scans are read from the store instead of CloudWatch.
+    """
+    series_keys = [
+        (resource_id, metric_name, stat)
+        for resource_id in resource_ids
+        for metric_name, stats in metric_stats.items()
+        for stat in stats
+    ]
+    if store is not None:
+        series = query_series_incremental(
+            store, cloudwatch_client, namespace, dimension_name, series_keys, start_time, end_time, period
+        )
+    else:
+        series = query_series(cloudwatch_client, namespace, dimension_name, series_keys, start_time, end_time, period)
+
+    merged = defaultdict(lambda: defaultdict(dict))
+    for (resource_id, metric_name, stat), values in series.items():
+        for timestamp, value in values:
+            datapoint = merged[(resource_id, metric_name)].setdefault(timestamp, {'Timestamp': timestamp})
+            datapoint[stat] = value
+
+    fleet = {resource_id: {metric_name: [] for metric_name in metric_stats} for resource_id in resource_ids}
+    for (resource_id, metric_name), by_time in merged.items():
+        fleet[resource_id][metric_name] = [by_time[ts] for ts in sorted(by_time)]
+    return fleet
+
+
+def average_datapoints(datapoints, stat='Average'):
+    values = [dp[stat] for dp in datapoints if stat in dp]
+    if not values:
+        return 0.0
+    return sum(values) / len(values)
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'autocloud-audit', 'pricing.json')
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def parse_on_demand_price(price_item):
+    """Pull the hourly on-demand USD price out of one Pricing API PriceList entry."""
+    if isinstance(price_item, str):
+        price_item = json.loads(price_item)
+    for term in price_item.get('terms', {}).get('OnDemand', {}).values():
+        for dimension in term.get('priceDimensions', {}).values():
+            usd = dimension.get('pricePerUnit', {}).get('USD')
+            if usd is not None:
+                return float(usd)
+    return None
+
+
+class PricingCache:
+    """Price lookups persisted to a JSON file and shared across runs.
+
+    Entries are keyed by (instance type, region, OS, tenancy) and expire
+    after ttl_seconds. A missing price is cached too, so unknown types are
+    not looked up again on every instance. Concurrent lookups of the same
+    key wait for a single fetch.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._entries = self._load()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _key(instance_type, region, operating_system, tenancy):
+        return '|'.join((instance_type, region, operating_system, tenancy))
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry and time.time() - entry['fetched_at'] < self.ttl_seconds:
+            return entry
+        return None
+
+    def get_or_fetch(self, instance_type, region, operating_system, tenancy, fetch):
+        """Return the cached price, calling fetch() only for unseen or expired keys."""
+        key = self._key(instance_type, region, operating_system, tenancy)
+        with self._lock:
+            entry = self._fresh(key)
+            if entry:
+                return entry['price']
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._fresh(key)
+                if entry:
+                    return entry['price']
+            price = fetch()
+            with self._lock:
+                self._entries[key] = {'price': price, 'fetched_at': time.time()}
+                self._dirty = True
+            return price
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temp file and rename so an interrupted run never leaves a torn cache.
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def configure_pricing_cache(path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS):
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = PricingCache(path, ttl_seconds)
+        return _default_cache
+
+
+def get_pricing_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PricingCache()
+        return _default_cache
@@ -0,0 +1,245 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+
+REGION_NAMES = {
+    'us-east-1': 'US East (N. Virginia)',
+    'us-east-2': 'US East (Ohio)',
+    'us-west-1': 'US West (N. California)',
+    'us-west-2': 'US West (Oregon)',
+    'af-south-1': 'Africa (Cape Town)',
+    'ap-east-1': 'Asia Pacific (Hong Kong)',
+    'ap-south-2': 'Asia Pacific (Hyderabad)',
+    'ap-southeast-3': 'Asia Pacific (Jakarta)',
+    'ap-southeast-5': 'Asia Pacific (Malaysia)',
+    'ap-southeast-4': 'Asia Pacific (Melbourne)',
+    'ap-south-1': 'Asia Pacific (Mumbai)',
+    'ap-northeast-3': 'Asia Pacific (Osaka)',
+    'ap-northeast-2': 'Asia Pacific (Seoul)',
+    'ap-southeast-1': 'Asia Pacific (Singapore)',
+    'ap-southeast-2': 'Asia Pacific (Sydney)',
+    'ap-southeast-7': 'Asia Pacific (Thailand)',
+    'ap-northeast-1': 'Asia Pacific (Tokyo)',
+    'ca-central-1': 'Canada (Central)',
+    'ca-west-1': 'Canada West (Calgary)',
+    'eu-central-1': 'Europe (Frankfurt)',
+    'eu-west-1': 'Europe (Ireland)',
+    'eu-west-2': 'Europe (London)',
+    'eu-south-1': 'Europe (Milan)',
+    'eu-west-3': 'Europe (Paris)',
+    'eu-south-2': 'Europe (Spain)',
+    'eu-north-1': 'Europe (Stockholm)',
+    'eu-central-2': 'Europe (Zurich)',
+    'il-central-1': 'Israel (Tel Aviv)',
+    'mx-central-1': 'Mexico (Central)',
+    'me-south-1': 'Middle East (Bahrain)',
+    'me-central-1': 'Middle East (UAE)',
+    'sa-east-1': 'South America (São Paulo)'
+}
+
+# Product attributes kept from the offer file, named after their (normalized) column.
+INDEXED_ATTRIBUTES = (
+    'servicecode',
+    'productfamily',
+    'location',
+    'usagetype',
+    'instancetype',
+    'operatingsystem',
+    'tenancy',
+    'preinstalledsw',
+    'capacitystatus',
+    'licensemodel',
+    'volumeapiname',
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS prices (
+    sku TEXT,
+    {', '.join(f'{name} TEXT' for name in INDEXED_ATTRIBUTES)},
+    unit TEXT,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS prices_lookup ON prices (servicecode, location, instancetype, usagetype);
+CREATE TABLE IF NOT EXISTS source (path TEXT, mtime REAL);
+"""
+
+
+def get_region_name(region_code):
+    return REGION_NAMES.get(region_code, region_code)
+
+
+def normalize_attribute(name):
+    """'Instance Type', 'instanceType' and 'Pre Installed S/W' -> 'instancetype', 'preinstalledsw'."""
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def _row(sku, attributes, unit, price):
+    return (sku, *(attributes.get(name) for name in INDEXED_ATTRIBUTES), unit, price)
+
+
+def iter_json_offer_prices(path):
+    """Yield on-demand USD price rows from a bulk offer index.json.
+
+    The JSON format has to be parsed whole; for the full EC2 offer prefer
+    the regional files or the CSV format, which is streamed.
+    """
+    with open(path, encoding='utf-8') as f:
+        offer = json.load(f)
+    if not isinstance(offer, dict) or 'products' not in offer:
+        raise ValueError(f"{path} is not an AWS bulk offer file (no 'products' section).")
+
+    products = {}
+    for sku, product in offer.get('products', {}).items():
+        attributes = {normalize_attribute(k): v for k, v in product.get('attributes', {}).items()}
+        attributes['productfamily'] = product.get('productFamily')
+        attributes.setdefault('servicecode', offer.get('offerCode'))
+        products[sku] = attributes
+    del offer['products']
+
+    for sku, terms in offer.get('terms', {}).get('OnDemand', {}).items():
+        attributes = products.get(sku)
+        if attributes is None:
+            continue
+        for term in terms.values():
+            for dimension in term.get('priceDimensions', {}).values():
+                usd = dimension.get('pricePerUnit', {}).get('USD')
+                # Tiered prices (e.g. data transfer) keep only their first tier.
+                if usd is None or dimension.get('beginRange', '0') != '0':
+                    continue
+                yield _row(sku, attributes, dimension.get('unit'), float(usd))
+
+
+def iter_csv_offer_prices(path):
+    """Yield on-demand USD price rows from a bulk offer index.csv, one line at a time."""
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        try:
+            # The CSV starts with a few "FormatVersion"/"Publication Date" metadata lines.
+            for header in reader:
+                if header and header[0] == 'SKU':
+                    break
+            else:
+                raise ValueError(f"{path} is not an AWS bulk offer file (no 'SKU' header row).")
+            columns = [normalize_attribute(name) for name in header]
+
+            for values in reader:
+                record = dict(zip(columns, values))
+                if record.get('termtype') != 'OnDemand' or record.get('currency') != 'USD':
+                    continue
+                if record.get('startingrange', '0') not in ('0', ''):
+                    continue
+                try:
+                    price = float(record['priceperunit'])
+                except (KeyError, ValueError):
+                    continue
+                yield _row(record.get('sku'), record, record.get('unit'), price)
+        except csv.Error as e:
+            raise ValueError(f"{path} line {reader.line_num}: {e}") from e
+
+
+def build_price_index(offer_path, db_path):
+    """Index a downloaded AWS bulk offer file (JSON or CSV) into a SQLite lookup table."""
+    iter_prices = iter_csv_offer_prices if offer_path.lower().endswith('.csv') else iter_json_offer_prices
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        placeholders = ', '.join('?' * (len(INDEXED_ATTRIBUTES) + 3))
+        conn.executemany(f"INSERT INTO prices VALUES ({placeholders})", iter_prices(offer_path))
+        conn.execute("INSERT INTO source VALUES (?, ?)", (os.path.abspath(offer_path), os.path.getmtime(offer_path)))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+
+def index_is_current(offer_path, db_path):
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT path, mtime FROM source").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return row is not None and row[0] == os.path.abspath(offer_path) and row[1] == os.path.getmtime(offer_path)
+
+
+class PriceIndex:
+    """Local, read-only price lookups against an indexed bulk offer file.
+
+    One SQLite connection is shared by every scan thread behind a lock;
+    each lookup is a single indexed query.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._memo = {}
+
+    @classmethod
+    def from_offer_file(cls, offer_path, db_path=None):
+        """Open the index for offer_path, (re)building it when the offer file has changed."""
+        db_path = db_path or offer_path + '.sqlite'
+        if not index_is_current(offer_path, db_path):
+            print(f"Indexing price list {offer_path} ...")
+            build_price_index(offer_path, db_path)
+        return cls(db_path)
+
+    def find_price(self, service_code, region, **attributes):
+        """Cheapest on-demand price for a product matching every given attribute, or None."""
+        unknown = set(attributes) - set(INDEXED_ATTRIBUTES)
+        if unknown:
+            raise ValueError(f"Unindexed price attributes: {', '.join(sorted(unknown))}")
+
+        key = (service_code, region, tuple(sorted(attributes.items())))
+        with self._lock:
+            if key not in self._memo:
+                clauses = ['servicecode = ?', 'location = ?'] + [f'{name} = ?' for name in attributes]
+                params = [service_code, get_region_name(region), *attributes.values()]
+                # A few SKUs (e.g. reservation placeholders) are listed at 0.0; prefer a real price.
+                row = self._conn.execute(
+                    f"SELECT MIN(price) FROM prices WHERE {' AND '.join(clauses)} AND price > 0",
+                    params,
+                ).fetchone()
+                self._memo[key] = row[0] if row else None
+            return self._memo[key]
+
+    def ec2_hourly_price(self, instance_type, region, operating_system='Linux', tenancy='Shared'):
+        return self.find_price(
+            'AmazonEC2', region,
+            instancetype=instance_type,
+            operatingsystem=operating_system,
+            tenancy=tenancy,
+            preinstalledsw='NA',
+            capacitystatus='Used',
+            licensemodel='No License required',
+        )
+
+    def ebs_gb_month_price(self, volume_type, region):
+        return self.find_price('AmazonEC2', region, productfamily='Storage', volumeapiname=volume_type)
+
+    def close(self):
+        self._conn.close()
+
+
+_default_index = None
+
+
+def configure_price_index(offer_path, db_path=None):
+    global _default_index
+    _default_index = PriceIndex.from_offer_file(offer_path, db_path) if offer_path else None
+    return _default_index
+
+
+def get_price_index():
+    """The configured offline price index, or None to fall back to the Pricing API."""
+    return _default_index
@@ -0,0 +1,117 @@
+import math
+import threading
+import time
+
+# Requests per second, per (service, operation) and region. ('service', '*')
+# applies to every operation of a service without a more specific entry.
+# Kept a little under the published AWS limits to leave room for other tools.
+DEFAULT_RATES = {
+    ('cloudtrail', 'LookupEvents'): 2,
+    ('pricing', 'GetProducts'): 5,
+    ('cloudwatch', 'GetMetricData'): 40,
+    ('cloudwatch', 'GetMetricStatistics'): 200,
+    ('cloudwatch', 'ListMetrics'): 20,
+    ('lambda', 'GetPolicy'): 15,
+    ('ec2', '*'): 50,
+    ('rds', '*'): 20,
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until it is available. Returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now and sleep outside the lock, so callers are served in order.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Token-bucket rate limits keyed by (service, operation, region).
+
+    attach() hooks a client's before-call event, so every API call the client
+    makes (including paginated ones) waits for a token first. Time spent
+    waiting is recorded per key and reported by wait_stats().
+    """
+
+    def __init__(self, rates=None):
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _rate_for(self, service, operation):
+        return self.rates.get((service, operation), self.rates.get((service, '*')))
+
+    def acquire(self, service, operation, region):
+        key = (service, operation, region)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = self._rate_for(service, operation)
+                bucket = self._buckets[key] = TokenBucket(rate) if rate else None
+
+        waited = bucket.acquire() if bucket else 0.0
+
+        with self._lock:
+            stats = self._stats.setdefault(key, {'calls': 0, 'waited': 0.0, 'max_wait': 0.0})
+            stats['calls'] += 1
+            stats['waited'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+        return waited
+
+    def attach(self, client):
+        service = client.meta.service_model.service_name
+        region = client.meta.region_name
+
+        def before_call(model, **kwargs):
+            self.acquire(service, model.name, region)
+
+        client.meta.events.register('before-call', before_call)
+        return client
+
+    def wait_stats(self):
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+
+def parse_rate_overrides(text):
+    """Parse "cloudtrail.LookupEvents=2,ec2.*=40" into a rates dict. A rate of 0 means unlimited."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, value = item.partition('=')
+        service, _, operation = name.strip().partition('.')
+        try:
+            rate = float(value)
+        except ValueError:
+            rate = None
+        if not service or not operation or rate is None or not math.isfinite(rate) or rate < 0:
+            raise ValueError(f"Invalid rate limit '{item}', expected service.Operation=rate with a rate of 0 or more.")
+        rates[(service, operation)] = rate
+    return rates
+
+
+def format_wait_report(limiter, min_wait=0.0):
+    lines = []
+    stats = sorted(limiter.wait_stats().items(), key=lambda item: item[1]['waited'], reverse=True)
+    for (service, operation, region), s in stats:
+        if s['waited'] <= min_wait:
+            continue
+        lines.append(
+            f"{service}.{operation} [{region}]: {s['calls']} calls, "
+            f"waited {s['waited']:.2f}s total, {s['max_wait']:.2f}s max"
+        )
+    return lines
@@ -0,0 +1,150 @@
+import base64
+import gzip
+import json
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+from botocore.awsrequest import AWSResponse
+from modules.core_modules.scan_store import UNSTORED_FIELDS
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(bytes(value)).decode('ascii')}
+    # Streaming bodies and other live objects cannot be replayed.
+    return None
+
+
+def _decode(obj):
+    if '__datetime__' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['__datetime__'])
+    if '__bytes__' in obj and len(obj) == 1:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def _redact(value):
+    """A copy of a parsed response without UNSTORED_FIELDS, at any depth; the original is left as is."""
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items() if key not in UNSTORED_FIELDS}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+
+def _params_key(params):
+    # Call times (e.g. CloudWatch StartTime/EndTime) differ on every run, so
+    # datetimes are matched by position only.
+    return json.dumps(params, sort_keys=True, default=lambda v: '<datetime>' if isinstance(v, datetime) else str(v))
+
+
+def _request_key(client, model, params):
+    return (client.meta.service_model.service_name, client.meta.region_name, model.name, _params_key(params))
+
+
+class ScanRecorder:
+    """Records every API response made through attached clients to a gzip JSON-lines archive.
+
+    The request parameters are captured on before-parameter-build and the
+    parsed response (errors included) on after-call, so the archive holds
+    exactly what the checkers saw, less UNSTORED_FIELDS (Lambda environment
+    variables), which are never written to disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        def capture_params(params, model, context, **kwargs):
+            context['replay_key'] = _request_key(client, model, params)
+
+        def record(http_response, parsed, model, context, **kwargs):
+            service, region, operation, params = context['replay_key']
+            line = json.dumps({
+                'service': service,
+                'region': region,
+                'operation': operation,
+                'params': params,
+                'status': http_response.status_code,
+                'response': _redact(parsed),
+            }, default=_encode)
+            with self._lock:
+                self._file.write(line + '\n')
+                self.calls += 1
+
+        client.meta.events.register('before-parameter-build', capture_params)
+        client.meta.events.register('after-call', record)
+        return client
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ScanReplayer:
+    """Serves recorded responses back to attached clients; nothing is sent over the network.
+
+    Identical requests are answered in the order they were recorded, and the
+    last answer is repeated if a request is made more often than it was
+    recorded. A request that was never recorded fails with a ReplayMiss
+    ClientError, which the checkers report like any other API error.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.misses = 0
+        self._responses = defaultdict(deque)
+        self._last = {}
+        self._lock = threading.Lock()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line, object_hook=_decode)
+                key = (entry['service'], entry['region'], entry['operation'], entry['params'])
+                self._responses[key].append((entry['status'], entry['response']))
+
+    def _next_response(self, key):
+        with self._lock:
+            queue = self._responses.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            elif key not in self._last:
+                self.misses += 1
+                return None
+            return self._last[key]
+
+    def attach(self, client):
+        def capture_params(params, model, context, **kwargs):
+            context['replay_key'] = _request_key(client, model, params)
+
+        def replay(model, context, **kwargs):
+            key = context['replay_key']
+            recorded = self._next_response(key)
+            if recorded is None:
+                status, parsed = 400, {
+                    'Error': {'Code': 'ReplayMiss', 'Message': f"No recorded response for {key[2]} in {key[1]}"},
+                    'ResponseMetadata': {'HTTPStatusCode': 400},
+                }
+            else:
+                status, parsed = recorded
+            return AWSResponse(None, status, {}, None), parsed
+
+        client.meta.events.register('before-parameter-build', capture_params)
+        # Registered first so replayed calls skip the rate limiter as well as the network.
+        client.meta.events.register_first('before-call', replay)
+        return client
+
+
+def open_interceptor(record_path=None, replay_path=None):
+    """The recorder or replayer for the given archive paths, or None for a live scan."""
+    if record_path and replay_path:
+        raise ValueError("Choose either record or replay, not both.")
+    if record_path:
+        return ScanRecorder(record_path)
+    if replay_path:
+        return ScanReplayer(replay_path)
+    return None
@@ -0,0 +1,249 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'autocloud-audit', 'scans.sqlite')
+# Fields never written to the store: Lambda environment variables often hold secrets.
+UNSTORED_FIELDS = ('Environment',)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    scan_id INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventory_lookup ON inventory (account, region, collection, resource_id, scanned_at);
+CREATE TABLE IF NOT EXISTS datapoints (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (account, region, namespace, dimension, resource_id, metric, stat, period, timestamp)
+);
+CREATE TABLE IF NOT EXISTS metric_windows (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    covered_from REAL NOT NULL,
+    covered_to REAL NOT NULL,
+    PRIMARY KEY (account, region, namespace, dimension, resource_id, metric, stat, period)
+);
+CREATE TABLE IF NOT EXISTS scan_results (
+    scan_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lambda_policies (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    function_arn TEXT NOT NULL,
+    revision_id TEXT NOT NULL,
+    policy TEXT,
+    PRIMARY KEY (account, region, function_arn)
+);
+"""
+
+
+def to_epoch(value):
+    return value.timestamp()
+
+
+def from_epoch(value):
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+class ScanStore:
+    """Local SQLite history of raw scan data, used to make the next scan incremental.
+
+    Keeps the latest raw inventory of each region (indexed by account,
+    region, resource ID and scan time, without UNSTORED_FIELDS), the
+    finalized CloudWatch datapoints of the current query window together
+    with the time window each series covers, Lambda resource policies keyed
+    by the function's RevisionId, and each scan's report rows for diffing.
+    One connection is shared by all scan threads behind a lock.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.account = None
+        self.scan_id = None
+
+    def begin_scan(self, account):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO scans (account, started_at) VALUES (?, ?)", (account, time.time())
+            )
+        self.account = account
+        self.scan_id = cursor.lastrowid
+        return self.scan_id
+
+    def finish_scan(self):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE scans SET finished_at = ? WHERE scan_id = ?", (time.time(), self.scan_id))
+
+    def close(self):
+        self._conn.close()
+
+    # Report rows
+
+    def save_results(self, resource_data):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scan_results VALUES (?, ?)",
+                (self.scan_id, json.dumps(resource_data, default=str)),
+            )
+
+    def load_results(self, scan_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM scan_results WHERE scan_id = ?", (scan_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def previous_scan_id(self):
+        """The latest finished scan of this account before the current one that saved its results."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(scans.scan_id) FROM scans JOIN scan_results USING (scan_id) "
+                "WHERE account = ? AND scan_id != ? AND finished_at IS NOT NULL",
+                (self.account, self.scan_id),
+            ).fetchone()
+        return row[0]
+
+    # Raw inventory
+
+    def save_inventory(self, region, collection, items, id_key):
+        """Replace the stored items of a collection with this scan's; older scans' rows are dropped."""
+        scanned_at = time.time()
+        rows = [
+            (self.scan_id, self.account, region, collection, item[id_key], scanned_at,
+             json.dumps({key: value for key, value in item.items() if key not in UNSTORED_FIELDS}, default=str))
+            for item in items
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM inventory WHERE account = ? AND region = ? AND collection = ?",
+                (self.account, region, collection),
+            )
+            self._conn.executemany("INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # CloudWatch datapoints
+
+    def metric_windows(self, region, namespace, dimension, period):
+        """{(resource_id, metric, stat): (covered_from, covered_to)} for every stored series."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource_id, metric, stat, covered_from, covered_to FROM metric_windows "
+                "WHERE account = ? AND region = ? AND namespace = ? AND dimension = ? AND period = ?",
+                (self.account, region, namespace, dimension, period),
+            ).fetchall()
+        return {(rid, metric, stat): (from_epoch(start), from_epoch(end)) for rid, metric, stat, start, end in rows}
+
+    def load_datapoints(self, region, namespace, dimension, period, start_time, end_time):
+        """{(resource_id, metric, stat): [(timestamp, value), ...]} stored between start and end."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource_id, metric, stat, timestamp, value FROM datapoints "
+                "WHERE account = ? AND region = ? AND namespace = ? AND dimension = ? AND period = ? "
+                "AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                (self.account, region, namespace, dimension, period, to_epoch(start_time), to_epoch(end_time)),
+            ).fetchall()
+        series = {}
+        for rid, metric, stat, timestamp, value in rows:
+            series.setdefault((rid, metric, stat), []).append((from_epoch(timestamp), value))
+        return series
+
+    def save_datapoints(self, region, namespace, dimension, period, series, windows, keep_from=None):
+        """Store finalized datapoints and the window each series is now complete for.
+
+        series maps (resource_id, metric, stat) to [(timestamp, value), ...];
+        windows maps the same keys to (covered_from, covered_to). Given
+        keep_from, the start of the query window, older datapoints of the
+        namespace are deleted and the stored windows shrink to match, so the
+        table doesn't grow with every scan.
+        """
+        base = (self.account, region, namespace, dimension)
+        point_rows = [
+            (*base, rid, metric, stat, period, to_epoch(timestamp), value)
+            for (rid, metric, stat), points in series.items()
+            for timestamp, value in points
+        ]
+        window_rows = [
+            (*base, rid, metric, stat, period, to_epoch(start), to_epoch(end))
+            for (rid, metric, stat), (start, end) in windows.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT OR REPLACE INTO datapoints VALUES ({', '.join('?' * 10)})", point_rows)
+            self._conn.executemany(f"INSERT OR REPLACE INTO metric_windows VALUES ({', '.join('?' * 10)})", window_rows)
+            if keep_from is not None:
+                scope = "account = ? AND region = ? AND namespace = ? AND dimension = ? AND period = ?"
+                cutoff = to_epoch(keep_from)
+                self._conn.execute(f"DELETE FROM datapoints WHERE {scope} AND timestamp < ?", (*base, period, cutoff))
+                self._conn.execute(
+                    f"UPDATE metric_windows SET covered_from = ? WHERE {scope} AND covered_from < ?",
+                    (cutoff, *base, period, cutoff),
+                )
+                self._conn.execute(
+                    f"DELETE FROM metric_windows WHERE {scope} AND covered_to < covered_from", (*base, period)
+                )
+
+    # Lambda resource policies
+
+    def lambda_policies(self, region):
+        """{function_arn: (revision_id, policy)} from earlier scans."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT function_arn, revision_id, policy FROM lambda_policies WHERE account = ? AND region = ?",
+                (self.account, region),
+            ).fetchall()
+        return {arn: (revision_id, policy) for arn, revision_id, policy in rows}
+
+    def save_lambda_policies(self, region, policies):
+        """policies maps function_arn to (revision_id, policy)."""
+        rows = [(self.account, region, arn, revision_id, policy) for arn, (revision_id, policy) in policies.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO lambda_policies VALUES (?, ?, ?, ?, ?)", rows)
+
+
+_stores = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+
+
+def attach_scan_store(session, store):
+    with _stores_lock:
+        _stores[session] = store
+
+
+def get_scan_store(session):
+    """The scan store attached to this session, or None when scans are not being recorded."""
+    with _stores_lock:
+        return _stores.get(session)
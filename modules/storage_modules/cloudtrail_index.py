@@ -0,0 +1,86 @@
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from modules.core_modules.client_factory import ScanCancelled
+
+# Object-level operations that count as the bucket being used.
+OBJECT_OPERATIONS = (
+    'GetObject', 'PutObject', 'CopyObject', 'DeleteObject', 'DeleteObjects',
+    'HeadObject', 'CreateMultipartUpload', 'CompleteMultipartUpload', 'RestoreObject',
+)
+
+
+def event_bucket_names(event):
+    names = {r['ResourceName'] for r in event.get('Resources', []) if r.get('ResourceType') == 'AWS::S3::Bucket'}
+    if not names and event.get('CloudTrailEvent'):
+        try:
+            params = json.loads(event['CloudTrailEvent']).get('requestParameters') or {}
+        except ValueError:
+            params = {}
+        if params.get('bucketName'):
+            names.add(params['bucketName'])
+    return names
+
+
+class CloudTrailAccessIndex:
+    """Bucket name -> last access time and operation counts from one CloudTrail pass.
+
+    The first lookup runs a single paginated lookup_events scan over the
+    window, filtered to the S3 event source; every later lookup is a dict
+    access. Note that CloudTrail Event history holds management events only.
+    S3 data events (GetObject, PutObject, ...) never appear in it, whatever
+    the trail settings, so object-level activity is only found in the
+    trail's own log files, which this index does not read.
+
+    If the scan fails, the empty index is kept, so the other buckets don't
+    repeat it.
+    """
+
+    def __init__(self, cloudtrail_client, days=30):
+        self.cloudtrail_client = cloudtrail_client
+        self.days = days
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        index = {}
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=self.days)
+        paginator = self.cloudtrail_client.get_paginator('lookup_events')
+        pages = paginator.paginate(
+            LookupAttributes=[{'AttributeKey': 'EventSource', 'AttributeValue': 's3.amazonaws.com'}],
+            StartTime=start,
+            EndTime=end,
+        )
+        for page in pages:
+            for event in page.get('Events', []):
+                for bucket_name in event_bucket_names(event):
+                    entry = index.setdefault(bucket_name, {'last_access': None, 'operations': Counter()})
+                    entry['operations'][event['EventName']] += 1
+                    if entry['last_access'] is None or event['EventTime'] > entry['last_access']:
+                        entry['last_access'] = event['EventTime']
+        return index
+
+    def _ensure_built(self):
+        with self._lock:
+            if self._index is None:
+                try:
+                    self._index = self._build()
+                except Exception as e:
+                    self._index = {}
+                    if isinstance(e, ScanCancelled):
+                        raise
+                    print(f"Error querying CloudTrail for S3 activity: {e}")
+            return self._index
+
+    def lookup(self, bucket_name):
+        return self._ensure_built().get(bucket_name)
+
+    def object_access(self, bucket_name):
+        """(object operation count, last access time) for a bucket, or (0, None)."""
+        entry = self.lookup(bucket_name)
+        if not entry:
+            return 0, None
+        count = sum(entry['operations'][op] for op in OBJECT_OPERATIONS)
+        return count, entry['last_access'] if count else None
@@ -1,6 +1,7 @@
 import boto3
 import datetime
 from botocore.exceptions import ClientError
+from modules.core_modules.client_factory import get_client
 
 def get_cloudwatch_metrics(client, db_id, metric_name, stat, period=86400, days=7):
     end_time = datetime.datetime.utcnow()
@@ -24,13 +25,19 @@ def get_cloudwatch_metrics(client, db_id, metric_name, stat, period=86400, days=
         print(f"Error fetching CloudWatch metrics for {db_id}: {e}")
         return None
 
-def check_rds_utilization(session, region):
-    rds = session.client('rds', region_name=region)
-    cloudwatch = session.client('cloudwatch', region_name=region)
-    results = []
+def iter_db_instances(rds_client):
+    for page in rds_client.get_paginator('describe_db_instances').paginate():
+        yield from page['DBInstances']
+
+def iter_db_snapshots(rds_client, snapshot_type):
+    for page in rds_client.get_paginator('describe_db_snapshots').paginate(SnapshotType=snapshot_type):
+        yield from page['DBSnapshots']
+
+def iter_rds_utilization(session, region):
+    rds = get_client(session, 'rds', region)
+    cloudwatch = get_client(session, 'cloudwatch', region)
     try:
-        dbs = rds.describe_db_instances()['DBInstances']
-        for db in dbs:
+        for db in iter_db_instances(rds):
             db_id = db['DBInstanceIdentifier']
             engine = db['Engine']
             instance_class = db['DBInstanceClass']
@@ -45,7 +52,7 @@ def check_rds_utilization(session, region):
                 total_bytes = allocated * 1024 * 1024 * 1024
                 used_percent = round((1 - (storage_free / total_bytes)) * 100, 2)
 
-            results.append({
+            yield {
                 'DB Identifier': db_id,
                 'Engine': engine,
                 'Class': instance_class,
@@ -54,36 +61,37 @@ def check_rds_utilization(session, region):
                 'Used Storage (%)': used_percent,
                 'Multi-AZ': multi_az,
                 'Tags': {tag['Key']: tag['Value'] for tag in tags},
-            })
+            }
     except ClientError as e:
         print(f"Error retrieving RDS utilization: {e}")
-    return results
 
-def list_rds_snapshots(session, region):
-    rds = session.client('rds', region_name=region)
-    results = []
+def check_rds_utilization(session, region):
+    return list(iter_rds_utilization(session, region))
+
+def iter_rds_snapshots(session, region):
+    rds = get_client(session, 'rds', region)
     try:
-        snapshots = rds.describe_db_snapshots(SnapshotType='manual')['DBSnapshots']
-        for snap in snapshots:
+        for snap in iter_db_snapshots(rds, 'manual'):
             age_days = (datetime.datetime.utcnow() - snap['SnapshotCreateTime'].replace(tzinfo=None)).days
-            results.append({
+            yield {
                 'Snapshot ID': snap['DBSnapshotIdentifier'],
                 'DB Instance': snap['DBInstanceIdentifier'],
                 'Created On': snap['SnapshotCreateTime'].strftime('%Y-%m-%d'),
                 'Age (days)': age_days,
                 'Size (GB)': snap.get('AllocatedStorage', 'N/A')
-            })
+            }
     except ClientError as e:
         print(f"Error retrieving manual RDS snapshots: {e}")
-    return results
+
+def list_rds_snapshots(session, region):
+    return list(iter_rds_snapshots(session, region))
 
 def analyze_performance_insights(session, region):
-    insights = session.client('pi', region_name=region)
-    rds = session.client('rds', region_name=region)
+    insights = get_client(session, 'pi', region)
+    rds = get_client(session, 'rds', region)
     results = []
     try:
-        dbs = rds.describe_db_instances()['DBInstances']
-        for db in dbs:
+        for db in iter_db_instances(rds):
             arn = db['DBInstanceArn']
             id = db['DBInstanceIdentifier']
             try:
@@ -109,7 +117,7 @@ def analyze_performance_insights(session, region):
     return results
 
 def check_rds_proxies(session, region):
-    rds = session.client('rds', region_name=region)
+    rds = get_client(session, 'rds', region)
     results = []
     try:
         proxies = rds.describe_db_proxies()['DBProxies']
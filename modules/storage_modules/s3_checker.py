@@ -1,117 +1,227 @@
 import boto3
-from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from botocore.exceptions import ClientError
+from modules.core_modules.client_factory import get_client
+from modules.storage_modules.cloudtrail_index import CloudTrailAccessIndex
+from modules.storage_modules.s3_storage_metrics import fetch_bucket_storage_metrics
+from modules.storage_modules.s3_object_stats import collect_object_stats, collect_object_stats_parallel
 
-def get_cloudtrail_access(cloudtrail_client, bucket_name):
-    """Query CloudTrail for recent S3 access events for a given bucket."""
-    now = datetime.now(timezone.utc)
-    start_time = now - timedelta(days=30)
-    events_found = False
+DEFAULT_BUCKET_WORKERS = 8
+
+# GetBucketLocation reports us-east-1 as an empty constraint and old Ireland buckets as "EU".
+LEGACY_LOCATION_CONSTRAINTS = {None: 'us-east-1', '': 'us-east-1', 'EU': 'eu-west-1'}
+
+def normalize_bucket_region(location):
+    return LEGACY_LOCATION_CONSTRAINTS.get(location, location)
+
+def get_bucket_region(s3_client, bucket_name):
+    return normalize_bucket_region(s3_client.get_bucket_location(Bucket=bucket_name).get('LocationConstraint'))
+
+def fetch_storage_metrics_by_region(session, bucket_regions):
+    """One batched CloudWatch storage metrics read per bucket region."""
+    names_by_region = {}
+    for bucket_name, region in bucket_regions.items():
+        names_by_region.setdefault(region, []).append(bucket_name)
+
+    storage = {}
+    for region, names in names_by_region.items():
+        try:
+            storage.update(fetch_bucket_storage_metrics(get_client(session, 'cloudwatch', region), names))
+        except Exception as e:
+            print(f"Error reading S3 storage metrics in {region}: {e}")
+    return storage
+
+def apply_object_stats(bucket_data, stats):
+    bucket_data["Total Objects"] = stats.count
+    bucket_data["Total Size (GB)"] = round(stats.total_size / (1024 ** 3), 2)
+    bucket_data["Object Sizes"] = stats.histogram_summary() or "N/A"
+
+    if stats.count:
+        bucket_data["Last Object Upload"] = stats.newest.strftime('%Y-%m-%d')
+        # Raw upload times for evaluate_bucket; not report columns.
+        bucket_data["Newest Object"] = stats.newest.isoformat()
+        bucket_data["Oldest Object"] = stats.oldest.isoformat()
+    else:
+        bucket_data["Notes"].append("Bucket is empty.")
+
+def apply_storage_metrics(bucket_data, metrics):
+    if metrics:
+        bucket_data["Total Objects"] = metrics['objects']
+        bucket_data["Total Size (GB)"] = round(metrics['size_bytes'] / (1024 ** 3), 2)
+        if not metrics['objects']:
+            bucket_data["Notes"].append("Bucket is empty.")
+    else:
+        bucket_data["Notes"].append("No CloudWatch storage metrics (bucket is empty or less than a day old).")
 
+def fetch_versioning_status(s3_client, bucket_name):
+    return s3_client.get_bucket_versioning(Bucket=bucket_name).get('Status', 'Disabled')
+
+def fetch_is_public(s3_client, bucket_name):
+    acl = s3_client.get_bucket_acl(Bucket=bucket_name)
+    return any(grant['Grantee'].get('URI', '').endswith('AllUsers') for grant in acl['Grants'])
+
+def fetch_lifecycle_status(s3_client, bucket_name):
     try:
-        response = cloudtrail_client.lookup_events(
-            LookupAttributes=[
-                {
-                    'AttributeKey': 'ResourceName',
-                    'AttributeValue': bucket_name
-                }
-            ],
-            StartTime=start_time,
-            EndTime=now,
-            MaxResults=50
-        )
-        for event in response.get('Events', []):
-            if any(op in event['EventName'] for op in ['GetObject', 'PutObject']):
-                events_found = True
-                break
-    except ClientError as e:
-        print(f"Error querying CloudTrail for bucket {bucket_name}: {e}")
-    
-    return events_found
+        s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)
+        return "Enabled"
+    except ClientError:
+        return "None"
+
+def fetch_logging_enabled(s3_client, bucket_name):
+    return "LoggingEnabled" in s3_client.get_bucket_logging(Bucket=bucket_name)
+
+def new_bucket_record(bucket_name, region):
+    return {
+        "Bucket Name": bucket_name,
+        "Region": region,
+        "Last Object Upload": "N/A",
+        "Total Objects": 0,
+        "Total Size (GB)": 0,
+        "Object Sizes": "N/A",
+        "Public?": "Unknown",
+        "Versioning": "Disabled",
+        "Lifecycle": "None",
+        "Access Frequency": "Unknown",
+        "Notes": []
+    }
+
+def audit_bucket(bucket_name, region, s3_client, access_index, config_pool, storage=None,
+                 use_listing=True, prefix_workers=1):
+    """Audit one bucket through a client for its home region.
+
+    The independent bucket config calls run concurrently on config_pool
+    while the bucket's objects are listed (deep mode) on this thread.
+    """
+    bucket_data = new_bucket_record(bucket_name, region)
+
+    versioning = config_pool.submit(fetch_versioning_status, s3_client, bucket_name)
+    public = config_pool.submit(fetch_is_public, s3_client, bucket_name)
+    lifecycle = config_pool.submit(fetch_lifecycle_status, s3_client, bucket_name)
+    logging = config_pool.submit(fetch_logging_enabled, s3_client, bucket_name)
+
+    try:
+        stats = None
+        if use_listing:
+            if prefix_workers > 1:
+                stats = collect_object_stats_parallel(s3_client, bucket_name, max_workers=prefix_workers)
+            else:
+                stats = collect_object_stats(s3_client, bucket_name)
+
+        bucket_data["Versioning"] = versioning.result()
+
+        if public.result():
+            bucket_data["Public?"] = "Yes"
+            bucket_data["Notes"].append("Bucket is publicly accessible.")
+        else:
+            bucket_data["Public?"] = "No"
+
+        bucket_data["Lifecycle"] = lifecycle.result()
+
+        if use_listing:
+            apply_object_stats(bucket_data, stats)
+        else:
+            apply_storage_metrics(bucket_data, (storage or {}).get(bucket_name))
+
+    except Exception as e:
+        # One bad bucket must not cost the results of all the others.
+        bucket_data["Notes"].append(f"Error analyzing bucket: {e}")
+        return bucket_data
+
+    # A failed access lookup must not cost the bucket's stats either.
+    try:
+        if logging.result():
+            bucket_data["Access Frequency"] = "Logs enabled"
+        else:
+            # No access logs enabled, fallback to the CloudTrail access index
+            operations, last_access = access_index.object_access(bucket_name)
+            if operations:
+                bucket_data["Access Frequency"] = "Accessed (via CloudTrail)"
+                bucket_data["Notes"].append(
+                    f"Activity detected via CloudTrail ({operations} object operations, "
+                    f"last on {last_access.strftime('%Y-%m-%d')})."
+                )
+            else:
+                bucket_data["Access Frequency"] = "Unknown"
+                bucket_data["Notes"].append("No access logs or CloudTrail activity detected.")
+    except Exception as e:
+        bucket_data["Notes"].append(f"Error checking bucket access: {e}")
+
+    return bucket_data
 
-def analyze_s3_buckets(s3_client, cloudtrail_client):
-    report = []
+def evaluate_bucket(record, stale_upload_days=30, old_data_days=365):
+    """Report row for one collect_s3_buckets record, adding the upload-age notes."""
+    bucket_data = dict(record, Notes=list(record["Notes"]))
+    newest = bucket_data.pop("Newest Object", None)
+    oldest = bucket_data.pop("Oldest Object", None)
+    now = datetime.now(timezone.utc)
+
+    if newest and (now - datetime.fromisoformat(newest)).days > stale_upload_days:
+        bucket_data["Notes"].append(f"No objects added in last {stale_upload_days} days.")
+    if oldest and (now - datetime.fromisoformat(oldest)).days > old_data_days:
+        # Keep the wording of earlier reports at the default threshold.
+        age = "1 year" if old_data_days == 365 else f"{old_data_days} days"
+        bucket_data["Notes"].append(f"Contains data older than {age}.")
+    return bucket_data
+
+def analyze_s3_buckets(s3_client, cloudtrail_client, session=None, deep=False, prefix_workers=1,
+                       bucket_workers=DEFAULT_BUCKET_WORKERS):
+    return [
+        evaluate_bucket(record)
+        for record in collect_s3_buckets(s3_client, cloudtrail_client, session, deep, prefix_workers, bucket_workers)
+    ]
+
+def collect_s3_buckets(s3_client, cloudtrail_client, session=None, deep=False, prefix_workers=1,
+                       bucket_workers=DEFAULT_BUCKET_WORKERS):
+    """Audit every bucket, bucket_workers at a time, returning raw records for evaluate_bucket.
+
+    Each bucket's region is resolved once (list_buckets reports it on recent
+    APIs) and, given a session, its calls go through a client for that
+    region. By default object counts and sizes come from the daily
+    CloudWatch storage metrics. deep=True lists every object instead, which
+    is also needed for "Last Object Upload"; with prefix_workers > 1 each
+    bucket's top-level prefixes are listed in parallel.
+    """
     try:
         buckets = s3_client.list_buckets().get('Buckets', [])
     except ClientError as e:
         print("Error listing buckets:", e)
         return []
 
-    for bucket in buckets:
-        bucket_name = bucket['Name']
-        region = s3_client.get_bucket_location(Bucket=bucket_name).get('LocationConstraint', 'us-east-1') or 'us-east-1'
-        bucket_data = {
-            "Bucket Name": bucket_name,
-            "Region": region,
-            "Last Object Upload": "N/A",
-            "Total Objects": 0,
-            "Total Size (GB)": 0,
-            "Public?": "Unknown",
-            "Versioning": "Disabled",
-            "Lifecycle": "None",
-            "Access Frequency": "Unknown",
-            "Notes": []
-        }
+    region_errors = {}
 
+    def resolve_region(bucket):
+        if bucket.get('BucketRegion'):
+            return normalize_bucket_region(bucket['BucketRegion'])
         try:
-            versioning = s3_client.get_bucket_versioning(Bucket=bucket_name)
-            bucket_data["Versioning"] = versioning.get('Status', 'Disabled')
-
-            acl = s3_client.get_bucket_acl(Bucket=bucket_name)
-            for grant in acl['Grants']:
-                if grant['Grantee'].get('URI', '').endswith('AllUsers'):
-                    bucket_data["Public?"] = "Yes"
-                    bucket_data["Notes"].append("Bucket is publicly accessible.")
-                    break
-            else:
-                bucket_data["Public?"] = "No"
+            return get_bucket_region(s3_client, bucket['Name'])
+        except Exception as e:
+            region_errors[bucket['Name']] = e
+            return None
 
-            try:
-                s3_client.get_bucket_lifecycle_configuration(Bucket=bucket_name)
-                bucket_data["Lifecycle"] = "Enabled"
-            except ClientError:
-                bucket_data["Lifecycle"] = "None"
+    access_index = CloudTrailAccessIndex(cloudtrail_client)
 
-            logging = s3_client.get_bucket_logging(Bucket=bucket_name)
-            if "LoggingEnabled" in logging:
-                bucket_data["Access Frequency"] = "Logs enabled"
-            else:
-                # No access logs enabled, fallback to CloudTrail
-                access_detected = get_cloudtrail_access(cloudtrail_client, bucket_name)
-                if access_detected:
-                    bucket_data["Access Frequency"] = "Accessed (via CloudTrail)"
-                    bucket_data["Notes"].append("Activity detected via CloudTrail.")
-                else:
-                    bucket_data["Access Frequency"] = "Unknown"
-                    bucket_data["Notes"].append("No access logs or CloudTrail activity detected.")
-
-            # Object listing
-            objects = []
-            paginator = s3_client.get_paginator('list_objects_v2')
-            for page in paginator.paginate(Bucket=bucket_name):
-                contents = page.get('Contents', [])
-                for obj in contents:
-                    objects.append(obj)
-
-            bucket_data["Total Objects"] = len(objects)
-            total_size = sum(obj['Size'] for obj in objects)
-            bucket_data["Total Size (GB)"] = round(total_size / (1024 ** 3), 2)
-
-            if objects:
-                latest_upload = max(obj['LastModified'] for obj in objects)
-                bucket_data["Last Object Upload"] = latest_upload.strftime('%Y-%m-%d')
-
-                if (datetime.now(timezone.utc) - latest_upload).days > 30:
-                    bucket_data["Notes"].append("No objects added in last 30 days.")
-
-                oldest_upload = min(obj['LastModified'] for obj in objects)
-                if (datetime.now(timezone.utc) - oldest_upload).days > 365:
-                    bucket_data["Notes"].append("Contains data older than 1 year.")
-            else:
-                bucket_data["Notes"].append("Bucket is empty.")
+    def client_for(region):
+        return get_client(session, 's3', region) if session is not None else s3_client
+
+    with ThreadPoolExecutor(max_workers=bucket_workers) as bucket_pool, \
+            ThreadPoolExecutor(max_workers=bucket_workers * 4) as config_pool:
+        regions = list(bucket_pool.map(resolve_region, buckets))
+        bucket_regions = {bucket['Name']: region for bucket, region in zip(buckets, regions)}
+        located = {name: region for name, region in bucket_regions.items() if region is not None}
+
+        use_listing = deep or session is None
+        storage = {} if use_listing else fetch_storage_metrics_by_region(session, located)
 
-        except ClientError as e:
-            bucket_data["Notes"].append(f"Error analyzing bucket: {e}")
+        def audit(bucket_name):
+            region = bucket_regions[bucket_name]
+            if region is None:
+                bucket_data = new_bucket_record(bucket_name, "Unknown")
+                bucket_data["Notes"].append(f"Error resolving bucket region: {region_errors[bucket_name]}")
+                return bucket_data
+            return audit_bucket(
+                bucket_name, region, client_for(region), access_index, config_pool,
+                storage=storage, use_listing=use_listing, prefix_workers=prefix_workers,
+            )
 
-        report.append(bucket_data)
-    return report
+        return list(bucket_pool.map(audit, bucket_regions))
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bounds (exclusive) of the object size histogram classes, in bytes.
+SIZE_CLASSES = [
+    (1024, "< 1 KB"),
+    (1024 ** 2, "< 1 MB"),
+    (100 * 1024 ** 2, "< 100 MB"),
+    (1024 ** 3, "< 1 GB"),
+    (None, ">= 1 GB"),
+]
+
+
+class ObjectStats:
+    """Single-pass, constant-memory statistics over a stream of S3 objects."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_size = 0
+        self.newest = None
+        self.oldest = None
+        self.histogram = [0] * len(SIZE_CLASSES)
+
+    def add(self, obj):
+        size = obj['Size']
+        modified = obj['LastModified']
+        self.count += 1
+        self.total_size += size
+        if self.newest is None or modified > self.newest:
+            self.newest = modified
+        if self.oldest is None or modified < self.oldest:
+            self.oldest = modified
+        for index, (upper, _) in enumerate(SIZE_CLASSES):
+            if upper is None or size < upper:
+                self.histogram[index] += 1
+                break
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_size += other.total_size
+        if other.newest is not None and (self.newest is None or other.newest > self.newest):
+            self.newest = other.newest
+        if other.oldest is not None and (self.oldest is None or other.oldest < self.oldest):
+            self.oldest = other.oldest
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        return self
+
+    def histogram_summary(self):
+        return ", ".join(
+            f"{label}: {count}" for (_, label), count in zip(SIZE_CLASSES, self.histogram) if count
+        )
+
+
+def collect_object_stats(s3_client, bucket_name, prefix=''):
+    stats = ObjectStats()
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            stats.add(obj)
+    return stats
+
+
+def collect_object_stats_parallel(s3_client, bucket_name, max_workers=8, delimiter='/'):
+    """List each top-level key prefix of a bucket on its own worker.
+
+    The top-level prefixes are disjoint, so their stats can be merged
+    directly. Objects stored at the root of the bucket are counted while
+    the prefixes are discovered.
+    """
+    stats = ObjectStats()
+    prefixes = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Delimiter=delimiter):
+        for obj in page.get('Contents', []):
+            stats.add(obj)
+        prefixes.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+
+    if prefixes:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for partial in pool.map(lambda prefix: collect_object_stats(s3_client, bucket_name, prefix), prefixes):
+                stats.merge(partial)
+    return stats
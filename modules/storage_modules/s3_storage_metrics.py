@@ -0,0 +1,50 @@
+from datetime import datetime, timezone, timedelta
+from modules.core_modules.metrics_engine import build_metric_query, get_metric_data
+
+S3_NAMESPACE = 'AWS/S3'
+STORAGE_METRICS = ('BucketSizeBytes', 'NumberOfObjects')
+
+
+def fetch_bucket_storage_metrics(cloudwatch_client, bucket_names, days=3):
+    """Read the daily S3 storage metrics for many buckets of one region in bulk.
+
+    S3 publishes BucketSizeBytes once per storage class, so ListMetrics is
+    used to find which (bucket, storage type) series exist and only those
+    are queried. Returns {bucket_name: {'size_bytes': ..., 'objects': ...}}
+    built from the most recent datapoint of each series; buckets without
+    any published metrics are left out.
+    """
+    wanted = set(bucket_names)
+    queries = []
+    query_index = {}
+    seen = set()
+    paginator = cloudwatch_client.get_paginator('list_metrics')
+    for metric_name in STORAGE_METRICS:
+        for page in paginator.paginate(Namespace=S3_NAMESPACE, MetricName=metric_name):
+            for metric in page['Metrics']:
+                dimensions = {d['Name']: d['Value'] for d in metric['Dimensions']}
+                bucket_name = dimensions.get('BucketName')
+                series_key = (metric_name, tuple(sorted(dimensions.items())))
+                if bucket_name not in wanted or series_key in seen:
+                    continue
+                seen.add(series_key)
+                query_id = f"q{len(queries)}"
+                query_index[query_id] = (bucket_name, metric_name)
+                queries.append(build_metric_query(
+                    query_id, S3_NAMESPACE, metric_name, metric['Dimensions'], 'Average', 86400,
+                ))
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    storage = {}
+    for query_id, values in get_metric_data(cloudwatch_client, queries, start, end).items():
+        if not values:
+            continue
+        bucket_name, metric_name = query_index[query_id]
+        _, latest = max(values, key=lambda point: point[0])
+        totals = storage.setdefault(bucket_name, {'size_bytes': 0.0, 'objects': 0})
+        if metric_name == 'BucketSizeBytes':
+            totals['size_bytes'] += latest
+        else:
+            totals['objects'] += int(latest)
+    return storage